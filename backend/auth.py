@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import create_access_token, get_jwt, jwt_required
+from sqlalchemy import func, select
+from models import db, User, TokenRevocation
+
+# Role-aware access tokens.
+# login() bakes the caller's role and verification status into the token, so
+# admin_required/user_required authorize a request from the token alone
+# instead of loading the user on every call. When a user's role changes or
+# the account is deleted, revoke_tokens() records it; every worker keeps a
+# short-lived copy of the recent revocations and rejects tokens issued
+# before them, so a demotion takes effect within REVOCATION_CACHE_SECONDS.
+
+REVOCATION_CACHE_SECONDS = 30
+
+
+def token_claims(user):
+    return {"role": user.role or "user", "verified": bool(user.is_verified)}
+
+
+def issue_access_token(user):
+    return create_access_token(identity=str(user.id), additional_claims=token_claims(user))
+
+
+def revoke_tokens(user_id):
+    """
+    Invalidates every token issued to `user_id` so far. The caller commits,
+    then calls revocations.clear() so this worker reloads straight away.
+    """
+    db.session.add(TokenRevocation(user_id=user_id))
+
+
+class RevocationCache:
+    """The latest revocation time per user, reloaded at most every `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds=REVOCATION_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.revoked = {}
+        self.expires = 0.0
+        self.lock = threading.Lock()
+
+    def revoked_at(self, user_id):
+        if time.monotonic() >= self.expires:
+            with self.lock:
+                if time.monotonic() >= self.expires:
+                    self.revoked = self.load()
+                    self.expires = time.monotonic() + self.ttl_seconds
+        return self.revoked.get(user_id)
+
+    def load(self):
+        # Revocations older than the token lifetime can't match a live token
+        lifetime = current_app.config["JWT_ACCESS_TOKEN_EXPIRES"]
+        since = datetime.now(timezone.utc) - lifetime
+        rows = db.session.execute(
+            select(TokenRevocation.user_id, func.max(TokenRevocation.revoked_at))
+            .where(TokenRevocation.revoked_at > since)
+            .group_by(TokenRevocation.user_id)
+        )
+        return {user_id: _timestamp(revoked_at) for user_id, revoked_at in rows}
+
+    def clear(self):
+        self.expires = 0.0
+
+
+def _timestamp(value):
+    # SQLite hands back naive datetimes; they were written in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+revocations = RevocationCache()
+
+
+def is_token_revoked(jwt_header, jwt_payload):
+    """flask_jwt_extended token_in_blocklist_loader."""
+    try:
+        user_id = int(jwt_payload["sub"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    revoked_at = revocations.revoked_at(user_id)
+    # iat has whole-second resolution: a token from the revocation's own
+    # second counts as revoked
+    return revoked_at is not None and jwt_payload.get("iat", 0) <= int(revoked_at)
+
+
+def caller_claims():
+    """Role and verification of the caller, from the token when it has them."""
+    claims = get_jwt()
+    if "role" in claims:
+        return claims
+    # Tokens issued before role claims existed: look the user up once
+    user = db.session.get(User, int(claims["sub"]))
+    return token_claims(user) if user else {"role": None, "verified": False}
+
+
+def user_required(fn):
+    """Requires a valid access token for a verified account."""
+
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not caller_claims().get("verified"):
+            return jsonify({"msg": "Please verify your email first"}), 403
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def admin_required(fn):
+    """Requires a valid access token for a verified admin."""
+
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        claims = caller_claims()
+        if claims.get("role") != "admin" or not claims.get("verified"):
+            return jsonify({"error": "Unauthorized. Admin access required."}), 403
+        return fn(*args, **kwargs)
+
+    return wrapper
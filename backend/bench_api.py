@@ -0,0 +1,447 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from functools import partial
+from datetime import datetime, timezone
+from typing import Callable
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+
+# Latency and throughput of the hot endpoints, written as JSON so runs can
+# be compared. Load a dataset first (synthdata.py), then e.g.
+#
+#   python bench_api.py --database sqlite:///synth.db \
+#       --database postgresql://localhost/libri_bench --output run.json
+#   python bench_api.py --database ... --compare run.json
+#
+# Every scenario sends --requests requests from --concurrency threads after
+# --warmup untimed ones, and reports throughput, latency percentiles and
+# the status codes seen. By default requests go through the app in-process
+# (a Flask test client per thread): routing, auth, SQL and serialization,
+# but no HTTP server. --url sends them to a running server instead, which
+# must use the same database and JWT_SECRET_KEY (tokens are minted here).
+#
+# return and borrow write to the database (they run last, in that order);
+# use a scratch copy of the dataset. --compare prints the change against an
+# earlier result file per database and scenario, and exits 1 when p50 or
+# p99 got slower, or throughput dropped, by more than --threshold percent.
+
+DEFAULT_SCENARIOS = (
+    "catalog",
+    "catalog_pages",
+    "book_detail",
+    "search",
+    "my_books",
+    "stats",
+    "history",
+    "admin_records",
+    "return",
+    "borrow",
+)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    # (fixtures, rng) -> (method, path, headers)
+    request: Callable
+    needs: tuple = ()  # fixtures that must be non-empty to run it
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+class Fixtures:
+    """Ids, tokens and search terms sampled from the database up front."""
+
+    def __init__(self, requests, members):
+        from app import encode_cursor
+        from auth import issue_access_token
+        from circulation import MAX_ACTIVE_BORROWS
+        from models import db, Book, BorrowRecord, User, UserCirculation
+
+        self.encode_cursor = encode_cursor
+        self.book_ids = db.session.scalars(
+            select(Book.id).order_by(func.random()).limit(2000)
+        ).all()
+        self.shelved_book_ids = db.session.scalars(
+            select(Book.id).where(Book.availableCopies > 0).order_by(func.random()).limit(2000)
+        ).all()
+        self.languages = db.session.scalars(
+            select(Book.language).where(Book.language.is_not(None)).distinct()
+        ).all()
+        titles = db.session.scalars(
+            select(Book.title).where(Book.title.is_not(None)).order_by(func.random()).limit(500)
+        ).all()
+        self.search_terms = sorted(
+            {word.strip(".,:;!?()'\"").lower() for title in titles for word in title.split()}
+            - {""}
+        )
+        self.search_terms = [term for term in self.search_terms if len(term) >= 4]
+
+        verified = (User.role == "user", User.is_verified.is_(True))
+        self.members = [
+            issue_access_token(user)
+            for user in db.session.scalars(
+                select(User).where(*verified).order_by(func.random()).limit(members)
+            )
+        ]
+        # Members below the loan limit, each borrowing about once
+        self.borrowers = [
+            issue_access_token(user)
+            for user in db.session.scalars(
+                select(User)
+                .outerjoin(UserCirculation, UserCirculation.user_id == User.id)
+                .where(
+                    *verified,
+                    func.coalesce(UserCirculation.active_loans, 0) < MAX_ACTIVE_BORROWS,
+                )
+                .order_by(func.random())
+                .limit(requests)
+            )
+        ]
+
+        loans = db.session.execute(
+            select(BorrowRecord.id, BorrowRecord.user_id)
+            .where(BorrowRecord.status == "borrowed")
+            .order_by(func.random())
+            .limit(requests)
+        ).all()
+        owners = {
+            user.id: issue_access_token(user)
+            for user in db.session.scalars(
+                select(User).where(User.id.in_({user_id for _, user_id in loans}))
+            )
+        }
+        self.loans = [(record_id, owners[user_id]) for record_id, user_id in loans]
+
+        admin = db.session.scalars(
+            select(User)
+            .where(User.role == "admin", User.is_verified.is_(True))
+            .order_by(User.id)
+            .limit(1)
+        ).first()
+        self.admin = [issue_access_token(admin)] if admin else []
+
+        self._next = {"loans": 0, "borrowers": 0}
+        self._lock = threading.Lock()
+
+    def take(self, name):
+        """Hands out the items of a one-shot fixture (loans, borrowers) in turn."""
+        items = getattr(self, name)
+        with self._lock:
+            n = self._next[name]
+            self._next[name] += 1
+        return items[n % len(items)]
+
+
+def _catalog_page(f, rng):
+    book_id = rng.choice(f.book_ids)
+    path = f"/api/books?limit=20&sort=id&cursor={f.encode_cursor('id', book_id, book_id)}"
+    if f.languages and rng.random() < 0.3:
+        path += f"&language={rng.choice(f.languages)}"
+    return "GET", path, {}
+
+
+def _return(f, rng):
+    record_id, token = f.take("loans")
+    return "POST", f"/api/return/{record_id}", bearer(token)
+
+
+def _borrow(f, rng):
+    book_id = rng.choice(f.shelved_book_ids)
+    return "POST", f"/api/borrow/{book_id}", bearer(f.take("borrowers"))
+
+
+def _admin_records(f, rng):
+    status = rng.choice(("all", "borrowed", "returned"))
+    path = f"/api/admin/borrow-records?limit=50&status={status}"
+    if status == "borrowed" and rng.random() < 0.5:
+        path += "&overdue=1"
+    return "GET", path, bearer(f.admin[0])
+
+
+SCENARIOS = {
+    s.name: s
+    for s in (
+        # The first page is the cached, ETag'd response most visitors get
+        Scenario("catalog", lambda f, rng: ("GET", "/api/books?limit=20", {})),
+        # Random keyset positions: every request is a cache miss
+        Scenario("catalog_pages", _catalog_page, needs=("book_ids",)),
+        Scenario(
+            "book_detail",
+            lambda f, rng: ("GET", f"/api/books/{rng.choice(f.book_ids)}", {}),
+            needs=("book_ids",),
+        ),
+        Scenario(
+            "search",
+            lambda f, rng: ("GET", f"/api/books/search?q={rng.choice(f.search_terms)}", {}),
+            needs=("search_terms",),
+        ),
+        Scenario(
+            "my_books",
+            lambda f, rng: ("GET", "/api/user/borrowed-books", bearer(rng.choice(f.members))),
+            needs=("members",),
+        ),
+        Scenario(
+            "stats",
+            lambda f, rng: ("GET", "/api/user/stats", bearer(rng.choice(f.members))),
+            needs=("members",),
+        ),
+        Scenario(
+            "history",
+            lambda f, rng: ("GET", "/api/user/history", bearer(rng.choice(f.members))),
+            needs=("members",),
+        ),
+        Scenario("admin_records", _admin_records, needs=("admin",)),
+        Scenario("return", _return, needs=("loans",)),
+        Scenario("borrow", _borrow, needs=("shelved_book_ids", "borrowers")),
+    )
+}
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, headers):
+        body = {} if method == "POST" else None
+        response = self.client.open(path, method=method, headers=headers, json=body)
+        response.get_data()  # drain streamed bodies
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+
+        self.session = requests.Session()
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, method, path, headers):
+        body = {} if method == "POST" else None
+        response = self.session.request(
+            method, self.base_url + path, headers=headers, json=body, timeout=60
+        )
+        return response.status_code
+
+
+def summarize(latencies, seconds, statuses, errors):
+    ms = sorted(value * 1000 for value in latencies)
+    cuts = statistics.quantiles(ms, n=100) if len(ms) > 1 else ms * 99
+    return {
+        "requests": len(ms),
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(ms) / seconds, 1) if seconds else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ms), 3) if ms else None,
+            "p50": round(cuts[49], 3) if ms else None,
+            "p90": round(cuts[89], 3) if ms else None,
+            "p99": round(cuts[98], 3) if ms else None,
+            "max": round(ms[-1], 3) if ms else None,
+        },
+        "statuses": dict(sorted(statuses.items())),
+        "errors": errors,
+    }
+
+
+def run_scenario(scenario, fixtures, make_client, requests, concurrency, warmup, seed):
+    warm = make_client()
+    warm_rng = random.Random(seed)
+    for _ in range(warmup if scenario.name not in ("return", "borrow") else 0):
+        warm.send(*scenario.request(fixtures, warm_rng))
+
+    remaining = [requests]
+    lock = threading.Lock()
+    latencies, statuses, errors = [], Counter(), [0]
+    start = threading.Barrier(concurrency + 1)
+
+    def worker(n):
+        client = make_client()
+        rng = random.Random(seed * 1000 + n)
+        mine, codes, failed = [], Counter(), 0
+        start.wait()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            method, path, headers = scenario.request(fixtures, rng)
+            started = time.perf_counter()
+            try:
+                status = client.send(method, path, headers)
+                failed += status >= 500
+            except Exception:
+                status = "exception"
+                failed += 1
+            mine.append(time.perf_counter() - started)
+            codes[str(status)] += 1
+        with lock:
+            latencies.extend(mine)
+            statuses.update(codes)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - started, statuses, errors[0])
+
+
+def dataset(db):
+    from models import Book, BorrowRecord, User
+
+    def count(model, *where):
+        return db.session.scalar(select(func.count()).select_from(model).where(*where))
+
+    return {
+        "books": count(Book),
+        "users": count(User),
+        "loans": count(BorrowRecord),
+        "active_loans": count(BorrowRecord, BorrowRecord.status == "borrowed"),
+    }
+
+
+def bench_database(uri, args, log=print):
+    from app import create_app
+    from models import db
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri} if uri else None)
+    with app.app_context():
+        url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        run = {
+            "database": url.render_as_string(hide_password=True),
+            "dialect": url.get_backend_name(),
+            "dataset": dataset(db),
+            "scenarios": {},
+        }
+        fixtures = Fixtures(args.requests, args.members)
+
+    if args.url:
+        make_client = partial(HttpClient, args.url)
+    else:
+        make_client = partial(InProcessClient, app)
+
+    log(f"\n== {run['database']} ({run['dataset']['books']:,} books, "
+        f"{run['dataset']['loans']:,} loans) ==")
+    for name in args.scenarios.split(","):
+        scenario = SCENARIOS[name]
+        missing = [need for need in scenario.needs if not getattr(fixtures, need)]
+        if missing:
+            log(f"{name:14} skipped: no {', '.join(missing)} in this database")
+            continue
+        result = run_scenario(
+            scenario, fixtures, make_client, args.requests, args.concurrency, args.warmup, args.seed
+        )
+        run["scenarios"][name] = result
+        latency = result["latency_ms"]
+        log(
+            f"{name:14} {result['throughput_rps']:8.1f} req/s  p50 {latency['p50']:8.2f} ms  "
+            f"p99 {latency['p99']:8.2f} ms  {result['statuses']}"
+        )
+    return run
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(baseline, result, threshold, log=print):
+    """Prints the change per scenario; returns the regressions found."""
+    regressions = []
+    earlier = {run["database"]: run for run in baseline["runs"]}
+    for run in result["runs"]:
+        base = earlier.get(run["database"])
+        if base is None:
+            log(f"\n{run['database']}: not in the baseline")
+            continue
+        log(f"\n== {run['database']} vs {baseline.get('commit') or 'baseline'} ==")
+        for name, now in run["scenarios"].items():
+            then = base["scenarios"].get(name)
+            if then is None:
+                continue
+            deltas = {
+                "p50": change(then["latency_ms"]["p50"], now["latency_ms"]["p50"]),
+                "p99": change(then["latency_ms"]["p99"], now["latency_ms"]["p99"]),
+                # Less throughput is the regression, so flip the sign
+                "rps": -change(then["throughput_rps"], now["throughput_rps"]),
+            }
+            worse = [key for key, delta in deltas.items() if delta > threshold]
+            if worse:
+                regressions.append((run["database"], name, worse))
+            log(
+                f"{name:14} p50 {deltas['p50']:+6.1f}%  p99 {deltas['p99']:+6.1f}%  "
+                f"req/s {-deltas['rps']:+6.1f}%  {'REGRESSION ' + ','.join(worse) if worse else ''}"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot endpoint latency and throughput.")
+    parser.add_argument(
+        "--database",
+        action="append",
+        help="SQLAlchemy URI; repeat to compare backends (default: SQLALCHEMY_DATABASE_URI)",
+    )
+    parser.add_argument("--url", help="benchmark a running server instead of in-process")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--members", type=int, default=200, help="member tokens for reads")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": args.url or "in-process",
+        "settings": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "members": args.members,
+            "seed": args.seed,
+        },
+        "runs": [bench_database(uri, args) for uri in args.database or [None]],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.threshold)
+        if regressions:
+            sys.exit(1)
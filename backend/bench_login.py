@@ -0,0 +1,161 @@
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+
+# Mixed-load benchmark: login bursts next to catalog browsing.
+# Starts the app on a local threaded server in a child process, then runs
+# login clients and catalog clients against it at the same time and reports
+# p50/p99 latency per endpoint. Each mode is a fresh server:
+#   inline  hashing on the request threads (PASSWORD_HASH_WORKERS=0)
+#   pool    hashing in the password process pool
+# Run against a scratch database, e.g.
+#   SQLALCHEMY_DATABASE_URI=sqlite:///bench.db python bench_login.py
+# Login p99 should stay about the same while catalog p99 drops sharply in
+# pool mode, because catalog requests no longer queue behind scrypt.
+
+BENCH_PASSWORD = "bench-password"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def ensure_users(app, count):
+    from werkzeug.security import generate_password_hash
+    from models import db, User
+
+    with app.app_context():
+        emails = [f"bench-{n}@example.com" for n in range(count)]
+        existing = {
+            email
+            for (email,) in db.session.query(User.email).filter(User.email.in_(emails))
+        }
+        for email in emails:
+            if email not in existing:
+                user = User(full_name=email, email=email, role="user", is_verified=True)
+                user.password_hash = generate_password_hash(
+                    BENCH_PASSWORD, app.config["PASSWORD_HASH_METHOD"]
+                )
+                db.session.add(user)
+        db.session.commit()
+    return emails
+
+
+def serve(workers, port, ready, stop):
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = create_app({"PASSWORD_HASH_WORKERS": workers})
+    hasher = app.extensions["libri"].password_hasher
+    hasher.start()
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ready.set()
+    stop.wait()
+    server.shutdown()
+    hasher.shutdown()
+
+
+def run_clients(port, emails, login_clients, catalog_clients, seconds):
+    latencies = defaultdict(list)
+    statuses = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def request(kind, method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        headers = {"Content-Type": "application/json"} if body else {}
+        started = time.perf_counter()
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        elapsed = (time.perf_counter() - started) * 1000
+        conn.close()
+        with lock:
+            latencies[kind].append(elapsed)
+            statuses[f"{kind} {response.status}"] += 1
+
+    def login_client(n):
+        i = n
+        while time.monotonic() < deadline:
+            body = json.dumps(
+                {"email": emails[i % len(emails)], "password": BENCH_PASSWORD, "role": "user"}
+            )
+            request("login", "POST", "/api/login", body)
+            i += login_clients
+
+    def catalog_client(n):
+        while time.monotonic() < deadline:
+            request("catalog", "GET", "/api/books?limit=20&sort=title")
+
+    threads = [threading.Thread(target=login_client, args=(n,)) for n in range(login_clients)]
+    threads += [
+        threading.Thread(target=catalog_client, args=(n,)) for n in range(catalog_clients)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, statuses
+
+
+def run_mode(mode, workers, args, emails):
+    context = multiprocessing.get_context("fork")
+    ready, stop = context.Event(), context.Event()
+    # Not a daemon: the server needs to start its own hashing workers
+    server = context.Process(target=serve, args=(workers, args.port, ready, stop))
+    server.start()
+    if not ready.wait(30):
+        server.terminate()
+        raise SystemExit(f"{mode}: server did not start")
+    time.sleep(0.2)
+    try:
+        latencies, statuses = run_clients(
+            args.port, emails, args.login_clients, args.catalog_clients, args.seconds
+        )
+    finally:
+        stop.set()
+        server.join(10)
+        if server.is_alive():
+            server.terminate()
+
+    print(f"\n== {mode} (hash workers: {workers}) ==")
+    for kind in ("login", "catalog"):
+        samples = latencies[kind]
+        print(
+            f"{kind:8} n={len(samples):6}  p50={percentile(samples, 50):8.1f} ms  "
+            f"p99={percentile(samples, 99):8.1f} ms"
+        )
+    print(f"responses: {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    from app import create_app, init_database
+
+    app = create_app()
+    with app.app_context():
+        init_database()
+
+    parser = argparse.ArgumentParser(description="Login vs catalog latency under mixed load.")
+    parser.add_argument("--modes", default="inline,pool", help="comma list of inline,pool")
+    parser.add_argument("--workers", type=int, default=app.config["PASSWORD_HASH_WORKERS"] or 2)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--catalog-clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    emails = ensure_users(app, args.users)
+    for mode in args.modes.split(","):
+        run_mode(mode, 0 if mode == "inline" else args.workers, args, emails)
@@ -0,0 +1,171 @@
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import insert, select
+from models import db, Book, BorrowRecord, User, book_serializer
+from serializers import LibriJSONProvider, Serializer, as_day
+
+# Rows/sec of the listing serializers against the previous per-row code.
+# Builds an in-memory SQLite catalog and times, for each case, the query,
+# the row -> dict step and the JSON encoding separately:
+#   legacy    ORM objects, dicts built with getattr/strftime, Flask's encoder
+#   compiled  Core rows, compiled Serializer, LibriJSONProvider
+#   python bench_serializers.py --books 20000 --loans 20000
+
+
+def legacy_book_dict(book):
+    return {c.name: getattr(book, c.name) for c in book.__table__.columns}
+
+
+def legacy_loan_dict(book, record):
+    return {
+        "record_id": record.id,
+        "book_id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "borrow_date": record.borrow_date.strftime("%Y-%m-%d"),
+        "due_date": record.due_date.strftime("%Y-%m-%d"),
+        "uploadedImageUrl": book.uploadedImageUrl,
+        "status": record.status,
+    }
+
+
+LOANS = Serializer(
+    [
+        BorrowRecord.id.label("record_id"),
+        Book.id.label("book_id"),
+        Book.title,
+        Book.author,
+        BorrowRecord.borrow_date,
+        BorrowRecord.due_date,
+        Book.uploadedImageUrl,
+        BorrowRecord.status,
+    ],
+    converters={"borrow_date": as_day, "due_date": as_day},
+)
+
+
+def seed(books, loans):
+    now = datetime.now(timezone.utc)
+    db.session.execute(
+        insert(User),
+        [{"full_name": "Bench", "email": "bench@example.com", "password_hash": "x"}],
+    )
+    db.session.execute(
+        insert(Book),
+        [
+            {
+                "title": f"Title {n}",
+                "author": f"Author {n % 500}",
+                "summary": "A summary of moderate length. " * 8,
+                "language": "English",
+                "copies": 3,
+                "availableCopies": 2,
+                "listPriceUsd": 9.99,
+                "uploadedImageUrl": f"https://example.com/covers/{n}.jpg",
+            }
+            for n in range(books)
+        ],
+    )
+    db.session.execute(
+        insert(BorrowRecord),
+        [
+            {
+                "user_id": 1,
+                "book_id": n % books + 1,
+                "borrow_date": now,
+                "due_date": now + timedelta(days=14),
+                "status": "borrowed",
+            }
+            for n in range(loans)
+        ],
+    )
+    db.session.commit()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def run(name, rows, fetch, serialize, provider, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()  # no warm identity map for the ORM path
+        fetched, t_fetch = timed(fetch)
+        dicts, t_serialize = timed(lambda: serialize(fetched))
+        _, t_dumps = timed(lambda: provider.dumps(dicts))
+        total = t_fetch + t_serialize + t_dumps
+        if best is None or total < best[0]:
+            best = (total, t_fetch, t_serialize, t_dumps)
+    total, t_fetch, t_serialize, t_dumps = best
+    print(
+        f"{name:16} {rows / total:10.0f} rows/s   fetch {t_fetch * 1000:7.1f} ms  "
+        f"to-dict {t_serialize * 1000:7.1f} ms  json {t_dumps * 1000:7.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listing serializer throughput.")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--loans", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    legacy_json = DefaultJSONProvider(app)
+    compiled_json = LibriJSONProvider(app)
+
+    with app.app_context():
+        db.create_all()
+        seed(args.books, args.loans)
+        books = book_serializer()
+        on_loan = Book.id == BorrowRecord.book_id
+
+        print(f"== books ({args.books} rows, {len(books.columns)} columns) ==")
+        run(
+            "legacy",
+            args.books,
+            lambda: Book.query.order_by(Book.id).all(),
+            lambda rows: [legacy_book_dict(book) for book in rows],
+            legacy_json,
+            args.repeat,
+        )
+        run(
+            "compiled",
+            args.books,
+            lambda: db.session.execute(select(*books.columns).order_by(Book.id)).all(),
+            books.rows,
+            compiled_json,
+            args.repeat,
+        )
+
+        print(f"== loans ({args.loans} rows, joined) ==")
+        run(
+            "legacy",
+            args.loans,
+            lambda: db.session.query(Book, BorrowRecord)
+            .join(BorrowRecord, on_loan)
+            .filter(BorrowRecord.user_id == 1)
+            .all(),
+            lambda rows: [legacy_loan_dict(book, record) for book, record in rows],
+            legacy_json,
+            args.repeat,
+        )
+        run(
+            "compiled",
+            args.loans,
+            lambda: db.session.execute(
+                select(*LOANS.columns)
+                .join(BorrowRecord, on_loan)
+                .where(BorrowRecord.user_id == 1)
+            ).all(),
+            LOANS.rows,
+            compiled_json,
+            args.repeat,
+        )
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Worker boot time: cold interpreter -> `import app` -> create_app() -> first
+# request served. Every sample is a fresh process, as with a gunicorn worker.
+#   factory   what a wsgi:app worker does now
+#   init-db   the same plus the schema checks every worker used to run on
+#             import (create_all, upgrade, search index, catalog state)
+# Run against an existing database, e.g.
+#   SQLALCHEMY_DATABASE_URI=sqlite:///bench.db python bench_startup.py
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app()
+if {init_db}:
+    with app.app_context():
+        app_module.init_database()
+created = time.perf_counter()
+response = app.test_client().get("/api/books?limit=20")
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({{
+    "import": imported - started,
+    "create_app": created - imported,
+    "first_request": served - created,
+    "total": served - started,
+}}))
+"""
+
+STEPS = ("import", "create_app", "first_request", "total")
+
+
+def sample(init_db):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(init_db=init_db)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start to first request.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--modes", default="factory,init-db")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        samples = [sample(mode == "init-db") for _ in range(args.runs)]
+        print(f"\n== {mode} ({args.runs} cold starts, median / max) ==")
+        for step in STEPS:
+            values = [s[step] * 1000 for s in samples]
+            print(f"{step:14} {statistics.median(values):8.1f} ms  {max(values):8.1f} ms")
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from sqlalchemy import text
+from models import db, CatalogState
+
+# In-process cache of serialized /api/books responses.
+# Entries are keyed by (catalog version, normalized query string). The version
+# lives in the catalog_state table so every worker sees the same counter; each
+# write path that touches Book bumps it inside its own transaction, which makes
+# all cached pages for older versions unreachable at once.
+
+CATALOG_STATE_ID = 1
+# Query parameters that never change the response body
+IGNORED_ARGS = frozenset({"_profile"})
+
+
+def ensure_catalog_state():
+    if db.session.get(CatalogState, CATALOG_STATE_ID) is None:
+        db.session.add(CatalogState(id=CATALOG_STATE_ID, version=0))
+        db.session.commit()
+
+
+def current_catalog_version():
+    return db.session.execute(
+        text("SELECT version FROM catalog_state WHERE id = :id"),
+        {"id": CATALOG_STATE_ID},
+    ).scalar() or 0
+
+
+def bump_catalog_version():
+    """Call inside the transaction that changes Book rows, before commit."""
+    db.session.execute(
+        text("UPDATE catalog_state SET version = version + 1 WHERE id = :id"),
+        {"id": CATALOG_STATE_ID},
+    )
+
+
+class CatalogCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key_for(args):
+        # Same parameters in any order map to the same entry
+        return "&".join(
+            f"{k}={v}" for k, v in sorted(args.items(multi=True)) if k not in IGNORED_ARGS
+        )
+
+    @staticmethod
+    def etag_for(version, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return f"v{version}-{digest}"
+
+    def get(self, version, key):
+        with self.lock:
+            if self.version is None or version > self.version:
+                # Catalog changed: nothing cached so far can be served again
+                self.entries.clear()
+                self.version = version
+            body = self.entries.get(key) if version == self.version else None
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, version, key, body):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self.lock:
+            self.hits += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,484 @@
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from operator import attrgetter
+from sqlalchemy import delete, exists, func, insert, literal, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Book, BorrowRecord, UserCirculation
+from catalog_cache import bump_catalog_version
+from mail_outbox import enqueue_email
+
+# Borrow and return as atomic conditional updates.
+# Stock is only ever changed with "availableCopies = availableCopies -/+ 1"
+# guarded in the WHERE clause, so concurrent borrows of the same title can
+# never oversell it. The per-user limit is the same kind of guarded update on
+# the member's user_circulation counters, which also locks that row, so one
+# member's parallel borrows queue behind each other while different members
+# never block. The loan insert is guarded on the member having no active
+# loan of the book, and the unique partial index on active (user_id, book_id)
+# rejects the duplicates two concurrent borrows could still race in.
+#
+#   python circulation.py reconcile   rebuild user_circulation from borrow_records
+
+MAX_ACTIVE_BORROWS = 5
+# Unique partial index on borrow_records: one active loan per user and book
+ACTIVE_LOAN_INDEX = "uq_borrow_records_active_user_book"
+LOAN_PERIOD = timedelta(days=30)
+# Loans due within this window are included in the reminder scan
+REMINDER_LEAD = timedelta(days=1)
+
+
+class CirculationError(Exception):
+    """A borrow/return that was refused; carries the HTTP response to send."""
+
+    def __init__(self, status, error, message=None):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+        self.message = message
+
+    def to_dict(self):
+        body = {"error": self.error}
+        if self.message:
+            body["message"] = self.message
+        return body
+
+
+def _insert_ignoring_conflicts(model):
+    if db.engine.dialect.name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return sqlite.insert(model).on_conflict_do_nothing()
+
+
+def _counter_columns():
+    """Aggregates over borrow_records matching the UserCirculation counters."""
+    return (
+        func.count().filter(BorrowRecord.status == "borrowed"),
+        func.count().filter(BorrowRecord.status == "returned"),
+        func.count().filter(BorrowRecord.renewed.is_(True)),
+    )
+
+
+def counters_query(user_id):
+    return select(*_counter_columns()).where(BorrowRecord.user_id == user_id)
+
+
+def counters_by_user_query():
+    return (
+        select(BorrowRecord.user_id, *_counter_columns())
+        .join(User, User.id == BorrowRecord.user_id)
+        .group_by(BorrowRecord.user_id)
+    )
+
+
+def active_loans_query(user_id, *columns):
+    """`columns` of a member's books that are out, joined to their loans."""
+    return (
+        select(*columns)
+        .join(BorrowRecord, Book.id == BorrowRecord.book_id)
+        .where(BorrowRecord.user_id == user_id, BorrowRecord.status == "borrowed")
+    )
+
+
+def loan_history_query(user_id, *columns):
+    """`columns` of a member's returned loans, most recently returned first."""
+    return (
+        select(*columns)
+        .join(BorrowRecord, Book.id == BorrowRecord.book_id)
+        .where(BorrowRecord.user_id == user_id, BorrowRecord.status == "returned")
+        .order_by(BorrowRecord.return_date.desc())
+    )
+
+
+def book_loans_query(book_id):
+    """Any active loan of `book_id`; a book on loan can't be deleted."""
+    return select(BorrowRecord.id).where(
+        BorrowRecord.book_id == book_id, BorrowRecord.status == "borrowed"
+    )
+
+
+def seed_counters(user_id):
+    """
+    Creates a member's counter row from their borrow_records, for members
+    whose loans predate the counters. Returns False when there is no such user.
+    """
+    if db.session.get(User, user_id) is None:
+        return False
+    active, returned, renewed = db.session.execute(counters_query(user_id)).one()
+    db.session.execute(
+        _insert_ignoring_conflicts(UserCirculation).values(
+            user_id=user_id,
+            active_loans=active,
+            returned_total=returned,
+            renewed_total=renewed,
+        )
+    )
+    return True
+
+
+def adjust_counters(user_id, **deltas):
+    """Applies `deltas` (column name -> change) to a member's counters."""
+    updated = db.session.execute(
+        update(UserCirculation)
+        .where(UserCirculation.user_id == user_id)
+        .values(
+            {name: getattr(UserCirculation, name) + delta for name, delta in deltas.items()}
+        )
+    )
+    if updated.rowcount == 0:
+        # No row yet: the seed counts borrow_records, which already include
+        # the change being recorded
+        seed_counters(user_id)
+
+
+def user_counters(user_id):
+    """Returns the member's UserCirculation row, creating it on first use."""
+    counters = db.session.get(UserCirculation, user_id)
+    if counters is None and seed_counters(user_id):
+        db.session.commit()
+        counters = db.session.get(UserCirculation, user_id)
+    return counters
+
+
+def _already_borrowed():
+    return CirculationError(
+        400,
+        "Already Borrowed, Please don't borrow it again.",
+        "You already have a copy of this book in your library!",
+    )
+
+
+def borrow(user_id, book_id, now=None):
+    """Lends one copy of `book_id` to `user_id`. Returns the updated book row."""
+    now = now or datetime.now(timezone.utc)
+    take_slot = (
+        update(UserCirculation)
+        .where(
+            UserCirculation.user_id == user_id,
+            UserCirculation.active_loans < MAX_ACTIVE_BORROWS,
+        )
+        .values(active_loans=UserCirculation.active_loans + 1)
+        .returning(UserCirculation.user_id)
+    )
+    try:
+        slot = db.session.execute(take_slot).first()
+        if slot is None:
+            has_counters = db.session.scalar(
+                select(UserCirculation.user_id).where(UserCirculation.user_id == user_id)
+            )
+            if has_counters is None:
+                if not seed_counters(user_id):
+                    raise CirculationError(404, "User not found")
+                slot = db.session.execute(take_slot).first()
+        if slot is None:
+            raise CirculationError(
+                403,
+                "Borrowing limit reached.",
+                f"You can only have {MAX_ACTIVE_BORROWS} active borrows at a time. Please return a book first.",
+            )
+
+        book = db.session.execute(
+            update(Book)
+            .where(Book.id == book_id, Book.availableCopies > 0)
+            .values(availableCopies=Book.availableCopies - 1)
+            .returning(*Book.__table__.columns)
+        ).mappings().first()
+        if book is None:
+            if db.session.get(Book, book_id) is None:
+                raise CirculationError(404, "Book not found")
+            raise CirculationError(400, "No copies available")
+
+        # Guarded on the member having no active loan of this book, so the
+        # rule holds even where ACTIVE_LOAN_INDEX is missing; with the index
+        # a concurrent duplicate still fails with IntegrityError below
+        loan = {
+            "user_id": user_id,
+            "book_id": book_id,
+            "borrow_date": now,
+            "due_date": now + LOAN_PERIOD,
+            "status": "borrowed",
+            "renewed": False,
+        }
+        inserted = db.session.execute(
+            insert(BorrowRecord).from_select(
+                list(loan),
+                select(
+                    *(
+                        literal(value, BorrowRecord.__table__.c[name].type)
+                        for name, value in loan.items()
+                    )
+                ).where(
+                    ~exists().where(
+                        BorrowRecord.user_id == user_id,
+                        BorrowRecord.book_id == book_id,
+                        BorrowRecord.status == "borrowed",
+                    )
+                ),
+            )
+        )
+        if inserted.rowcount == 0:
+            raise _already_borrowed()
+
+        bump_catalog_version()
+        db.session.commit()
+        return dict(book)
+    except IntegrityError:
+        db.session.rollback()
+        raise _already_borrowed()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def return_loan(record_id, user_id=None, now=None):
+    """
+    Closes an active loan and puts the copy back on the shelf.
+    With `user_id` the loan must belong to that member (self-service return);
+    without it any active loan can be closed (admin return).
+    """
+    now = now or datetime.now(timezone.utc)
+    try:
+        conditions = [BorrowRecord.id == record_id, BorrowRecord.status == "borrowed"]
+        if user_id is not None:
+            conditions.append(BorrowRecord.user_id == user_id)
+
+        closed = db.session.execute(
+            update(BorrowRecord)
+            .where(*conditions)
+            .values(status="returned", return_date=now)
+            .returning(BorrowRecord.book_id, BorrowRecord.user_id)
+        ).first()
+        if closed is None:
+            record = db.session.get(BorrowRecord, record_id)
+            if record is None or (user_id is not None and record.user_id != user_id):
+                raise CirculationError(404, "Borrow record not found")
+            raise CirculationError(400, "Book already returned")
+
+        db.session.execute(
+            update(Book)
+            .where(Book.id == closed.book_id)
+            .values(availableCopies=Book.availableCopies + 1)
+        )
+        adjust_counters(closed.user_id, active_loans=-1, returned_total=1)
+        bump_catalog_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def renew(record_id, user_id):
+    """Extends a member's active loan by one loan period, once. Returns the new due date."""
+    try:
+        record = db.session.execute(
+            select(BorrowRecord.due_date).where(
+                BorrowRecord.id == record_id,
+                BorrowRecord.user_id == user_id,
+                BorrowRecord.status == "borrowed",
+            )
+        ).first()
+        if record is None:
+            raise CirculationError(404, "Borrow record not found")
+
+        # Guarded on renewed so two simultaneous renewals can't both apply
+        new_due_date = record.due_date + LOAN_PERIOD
+        renewed = db.session.execute(
+            update(BorrowRecord)
+            .where(
+                BorrowRecord.id == record_id,
+                BorrowRecord.status == "borrowed",
+                BorrowRecord.renewed.is_not(True),
+            )
+            .values(due_date=new_due_date, renewed=True)
+        )
+        if renewed.rowcount == 0:
+            raise CirculationError(
+                400,
+                "Already Renewed",
+                "This book has already been renewed once. Please return it by the due date.",
+            )
+
+        adjust_counters(user_id, renewed_total=1)
+        db.session.commit()
+        return new_due_date
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def reconcile_counters():
+    """
+    Rebuilds every member's counters from borrow_records in one GROUP BY pass.
+    Returns how many members were counted and how many rows had drifted.
+    """
+    started = time.perf_counter()
+    try:
+        if db.engine.dialect.name == "postgresql":
+            # Borrows/returns wait until the rebuilt counters are committed
+            db.session.execute(text("LOCK TABLE user_circulation IN EXCLUSIVE MODE"))
+
+        current = {
+            row[0]: tuple(row[1:])
+            for row in db.session.execute(
+                select(
+                    UserCirculation.user_id,
+                    UserCirculation.active_loans,
+                    UserCirculation.returned_total,
+                    UserCirculation.renewed_total,
+                )
+            )
+        }
+        # On SQLite this first write takes the database write lock
+        db.session.execute(delete(UserCirculation))
+
+        expected = {
+            row[0]: tuple(row[1:])
+            for row in db.session.execute(counters_by_user_query())
+        }
+        if expected:
+            db.session.execute(
+                insert(UserCirculation),
+                [
+                    {
+                        "user_id": user_id,
+                        "active_loans": active,
+                        "returned_total": returned,
+                        "renewed_total": renewed,
+                    }
+                    for user_id, (active, returned, renewed) in expected.items()
+                ],
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    zero = (0, 0, 0)
+    drifted = sum(
+        1
+        for user_id in expected.keys() | current.keys()
+        if expected.get(user_id, zero) != current.get(user_id, zero)
+    )
+    return {
+        "users": len(expected),
+        "corrected": drifted,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def overdue_digest(full_name, loans):
+    lines = "\n".join(
+        f"  - {loan.title} (due {loan.due_date.strftime('%Y-%m-%d')})" for loan in loans
+    )
+    return (
+        f"Hi {full_name}, the following books are past their due date:\n\n"
+        f"{lines}\n\nPlease return them soon!"
+    )
+
+
+def overdue_loans_query(now):
+    """Loans due before now + REMINDER_LEAD not yet reminded for that due date."""
+    return (
+        select(
+            BorrowRecord.id,
+            BorrowRecord.user_id,
+            BorrowRecord.due_date,
+            Book.title,
+            User.email,
+            User.full_name,
+        )
+        .join(Book, Book.id == BorrowRecord.book_id)
+        .join(User, User.id == BorrowRecord.user_id)
+        .where(
+            BorrowRecord.status == "borrowed",
+            BorrowRecord.due_date < now + REMINDER_LEAD,
+            or_(
+                BorrowRecord.reminded_for_due.is_(None),
+                BorrowRecord.reminded_for_due != BorrowRecord.due_date,
+            ),
+        )
+        .order_by(BorrowRecord.user_id, BorrowRecord.due_date)
+    )
+
+
+def scan_overdue(now=None, chunk_size=1000):
+    """
+    Queues one digest reminder per borrower with loans due before now + 1 day
+    that have not been reminded for their current due date yet.
+
+    The loans come from one joined query streamed in `chunk_size` batches and
+    ordered by user, so each user's loans arrive together; their reminder
+    marks are written with one UPDATE per chunk. Everything commits at the
+    end, so a failed scan leaves no half-marked loans behind.
+    """
+    now = now or datetime.now(timezone.utc)
+    started = time.perf_counter()
+    report = {"rows": 0, "users": 0}
+
+    stmt = overdue_loans_query(now).execution_options(yield_per=chunk_size)
+
+    try:
+        pending_ids = []
+        rows = db.session.execute(stmt)
+        for _, loans in groupby(rows, key=attrgetter("user_id")):
+            loans = list(loans)
+            enqueue_email(
+                "Action Required: Overdue Books"
+                if len(loans) > 1
+                else "Action Required: Overdue Book",
+                overdue_digest(loans[0].full_name, loans),
+                recipients=[loans[0].email],
+            )
+            report["users"] += 1
+            report["rows"] += len(loans)
+            pending_ids.extend(loan.id for loan in loans)
+
+            if len(pending_ids) >= chunk_size:
+                mark_reminded(pending_ids)
+                pending_ids = []
+
+        if pending_ids:
+            mark_reminded(pending_ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def mark_reminded(record_ids):
+    db.session.execute(
+        update(BorrowRecord)
+        .where(BorrowRecord.id.in_(record_ids))
+        .values(reminded_for_due=BorrowRecord.due_date)
+        .execution_options(synchronize_session=False)
+    )
+    # Flushed digests are only weakly held by the session, so memory stays
+    # flat. No expunge_all(): that would also detach the caller's objects
+    # (run_job's JobRun), whose later changes would then never be saved.
+    db.session.flush()
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Circulation maintenance.")
+    parser.add_argument(
+        "command",
+        choices=["reconcile"],
+        help="reconcile: rebuild per-user counters from borrow_records",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        report = reconcile_counters()
+        print(
+            f"✅ Counters rebuilt for {report['users']} members "
+            f"({report['corrected']} corrected) in {report['seconds']}s"
+        )
@@ -1,7 +1,39 @@
-import pandas as pd
+import argparse
+import hashlib
 import json
+import os
 import re
-import numpy as np
+import pandas as pd
+
+# Converts the vendor CSV export into catalog records for importer.py.
+# The CSV is read in chunks with every column as text, then cast with an
+# explicit schema that matches the Book model. Alongside the full export we
+# keep a manifest of per-book fingerprints, so each run can also emit just
+# the rows that were added or changed since the previous export.
+
+DEFAULT_INPUT = "../src/data/book_list_cleaned.csv"
+DEFAULT_OUTPUT = "../src/data/books.json"
+DEFAULT_CHUNK_SIZE = 2000
+
+# Non-text Book columns (camelCase names); everything else stays a string.
+INT_COLUMNS = ["yearPublished", "wordCount", "numberOfPages", "quantity", "copies"]
+FLOAT_COLUMNS = [
+    "favorites",
+    "rating",
+    "wishList",
+    "listPriceUsd",
+    "purchasePriceUsd",
+]
+# Stored as strings on Book; normalized to ISO dates when they parse.
+DATE_COLUMNS = [
+    "datePublished",
+    "dateStarted",
+    "dateFinished",
+    "dateLoaned",
+    "dateBorrowed",
+    "dateAdded",
+    "purchaseDate",
+]
 
 
 def to_camel_case(text):
@@ -14,26 +46,132 @@ def to_camel_case(text):
     return camel
 
 
-# Load the file
-df = pd.read_csv("../src/data/book_list_cleaned.csv")
+def _parse_dates(column):
+    parsed = pd.to_datetime(column, errors="coerce", format="mixed")
+    # Keep the raw text when it is not a recognisable date
+    return parsed.dt.strftime("%Y-%m-%d").where(parsed.notna(), column)
+
+
+def cast_chunk(df):
+    """Applies the column schema to one chunk of raw text columns."""
+    df = df.rename(columns=to_camel_case)
+    df = df.apply(lambda col: col.str.strip()).replace("", None)
+
+    for name in INT_COLUMNS:
+        if name in df:
+            df[name] = pd.to_numeric(df[name], errors="coerce").round().astype("Int64")
+    for name in FLOAT_COLUMNS:
+        if name in df:
+            cleaned = df[name].str.replace("$", "", regex=False)
+            df[name] = pd.to_numeric(cleaned, errors="coerce")
+    for name in DATE_COLUMNS:
+        if name in df:
+            df[name] = _parse_dates(df[name])
+
+    # Missing values become JSON nulls
+    return df.astype(object).where(df.notna(), None)
+
+
+def record_key(record):
+    """Stable identity of a book across exports."""
+    if record.get("isbn"):
+        return f"isbn:{record['isbn']}"
+    if record.get("googleVolumeid"):
+        return f"gvid:{record['googleVolumeid']}"
+    # The current export has neither; subtitle carries the catalog number
+    return "title:{}|{}|{}".format(
+        record.get("title") or "",
+        record.get("subtitle") or "",
+        record.get("author") or "",
+    )
+
+
+def fingerprint(record):
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def iter_records(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for chunk in reader:
+        yield from cast_chunk(chunk).to_dict(orient="records")
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def convert(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Writes the full catalog to `output_path` (a JSON array, one record per
+    line) and the added/changed records since the last run to
+    `<output>.changes.ndjson`. Returns a summary dict.
+    """
+    base, _ = os.path.splitext(output_path)
+    manifest_path = f"{base}.manifest.json"
+    changes_path = f"{base}.changes.ndjson"
+    removed_path = f"{base}.removed.json"
+
+    previous = load_manifest(manifest_path)
+    current = {}
+    summary = {"total": 0, "added": 0, "changed": 0, "unchanged": 0, "duplicates": 0}
+
+    with open(output_path, "w", encoding="utf-8") as out, open(
+        changes_path, "w", encoding="utf-8"
+    ) as changes:
+        out.write("[\n")
+        for record in iter_records(input_path, chunk_size):
+            line = json.dumps(record, ensure_ascii=False)
+            out.write(("," if summary["total"] else "") + line + "\n")
+            summary["total"] += 1
+
+            key = record_key(record)
+            if key in current:
+                summary["duplicates"] += 1
+            digest = fingerprint(record)
+            current[key] = digest
+
+            if key not in previous:
+                summary["added"] += 1
+            elif previous[key] != digest:
+                summary["changed"] += 1
+            else:
+                summary["unchanged"] += 1
+                continue
+            changes.write(line + "\n")
+        out.write("]\n")
+
+    removed = sorted(set(previous) - set(current))
+    summary["removed"] = len(removed)
+    with open(removed_path, "w", encoding="utf-8") as f:
+        json.dump(removed, f, ensure_ascii=False)
+
+    # Only remember this export once everything above was written
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(current, f)
 
-# Create mapping for camelCase columns
-new_columns = {col: to_camel_case(col) for col in df.columns}
+    return summary
 
-# Rename columns
-df_camel = df.rename(columns=new_columns)
 
-# Replace NaN with None for valid JSON nulls
-df_final = df_camel.astype(object).replace({np.nan: None})
+def main():
+    parser = argparse.ArgumentParser(description="Convert the CSV export to catalog JSON.")
+    parser.add_argument("--input", default=DEFAULT_INPUT)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
 
-# Convert to list of dicts
-books_list = df_final.to_dict(orient="records")
+    summary = convert(args.input, args.output, args.chunk_size)
+    print(
+        f"Converted {summary['total']} books: {summary['added']} added, "
+        f"{summary['changed']} changed, {summary['removed']} removed, "
+        f"{summary['unchanged']} unchanged."
+    )
+    if summary["duplicates"]:
+        print(f"⚠️  {summary['duplicates']} rows share a key with an earlier row.")
 
-# Save to books.json
-with open("../src/data/books.json", "w", encoding="utf-8") as f:
-    json.dump(books_list, f, indent=2, ensure_ascii=False)
 
-# Print a few examples of the mapping for the user
-print("Mapping examples:")
-for old_col in list(df.columns)[:15]:
-    print(f"  {old_col} -> {to_camel_case(old_col)}")
+if __name__ == "__main__":
+    main()
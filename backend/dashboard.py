@@ -0,0 +1,136 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from models import db, User, Book, BorrowRecord
+
+# Numbers for the admin dashboard overview, aggregated in SQL.
+# The result is cached for a few seconds; when it expires one request
+# recomputes it while admins refreshing at the same time wait for that
+# result instead of each running the aggregates themselves.
+
+LOANS_PER_DAY_WINDOW = 30
+TOP_TITLES = 10
+
+
+def user_counts():
+    rows = db.session.execute(
+        select(
+            func.coalesce(User.role, "user"),
+            func.coalesce(User.is_verified, False),
+            func.count(),
+        ).group_by(func.coalesce(User.role, "user"), func.coalesce(User.is_verified, False))
+    ).all()
+
+    by_role = {}
+    for role, verified, count in rows:
+        counts = by_role.setdefault(role, {"verified": 0, "unverified": 0})
+        counts["verified" if verified else "unverified"] += count
+    return {
+        "total": sum(count for _, _, count in rows),
+        "verified": sum(count for _, verified, count in rows if verified),
+        "by_role": by_role,
+    }
+
+
+def overdue_count_query(now):
+    return (
+        select(func.count())
+        .select_from(BorrowRecord)
+        .where(BorrowRecord.status == "borrowed", BorrowRecord.due_date < now)
+    )
+
+
+def catalog_counts(now):
+    copies = func.coalesce(Book.copies, 0)
+    available = func.coalesce(Book.availableCopies, 0)
+    overdue = overdue_count_query(now).scalar_subquery()
+    titles, total_copies, copies_out, overdue_loans = db.session.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(copies), 0),
+            func.coalesce(func.sum(copies - available), 0),
+            overdue,
+        ).select_from(Book)
+    ).one()
+    return {
+        "titles": titles,
+        "copies": total_copies,
+        "copies_out": copies_out,
+        "overdue_loans": overdue_loans,
+    }
+
+
+def loans_per_day_query(start):
+    day = func.date(BorrowRecord.borrow_date)
+    return (
+        select(day, func.count())
+        .where(BorrowRecord.borrow_date >= start)
+        .group_by(day)
+    )
+
+
+def loans_per_day(now, days=LOANS_PER_DAY_WINDOW):
+    """Loans started on each of the last `days` days, oldest first, zeros included."""
+    first_day = (now - timedelta(days=days - 1)).date()
+    start = datetime.combine(first_day, datetime.min.time(), tzinfo=timezone.utc)
+    counts = {str(d): n for d, n in db.session.execute(loans_per_day_query(start))}
+    dates = [str(first_day + timedelta(days=n)) for n in range(days)]
+    return [{"date": d, "loans": counts.get(d, 0)} for d in dates]
+
+
+def top_titles_query(limit):
+    return (
+        select(BorrowRecord.book_id, func.count().label("loans"))
+        .group_by(BorrowRecord.book_id)
+        .order_by(func.count().desc(), BorrowRecord.book_id)
+        .limit(limit)
+    )
+
+
+def top_titles(limit=TOP_TITLES):
+    loans = top_titles_query(limit).subquery()
+    rows = db.session.execute(
+        select(Book.id, Book.title, Book.author, loans.c.loans)
+        .join(loans, loans.c.book_id == Book.id)
+        .order_by(loans.c.loans.desc(), Book.id)
+    )
+    return [
+        {"id": id, "title": title, "author": author, "loans": count}
+        for id, title, author, count in rows
+    ]
+
+
+def admin_summary(now=None):
+    now = now or datetime.now(timezone.utc)
+    return {
+        "users": user_counts(),
+        "catalog": catalog_counts(now),
+        "loans_per_day": loans_per_day(now),
+        "top_titles": top_titles(),
+        "generated_at": now.isoformat(),
+    }
+
+
+class SummaryCache:
+    def __init__(self, ttl_seconds=15):
+        self.ttl_seconds = ttl_seconds
+        self.value = None
+        self.expires = 0.0
+        self.lock = threading.Lock()
+
+    def get(self, compute):
+        """Returns (summary, hit). `compute` runs at most once per TTL window."""
+        if self.value is not None and time.monotonic() < self.expires:
+            return self.value, True
+        with self.lock:
+            # Someone else may have refreshed it while we waited
+            if self.value is not None and time.monotonic() < self.expires:
+                return self.value, True
+            self.value = compute()
+            self.expires = time.monotonic() + self.ttl_seconds
+            return self.value, False
+
+    def clear(self):
+        with self.lock:
+            self.value = None
@@ -0,0 +1,143 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Engine options from config, and a metered connection pool.
+# Every DB_* setting below has an environment variable of the same name
+# (see app.py). Checkouts, the time spent waiting for a connection, pool
+# timeouts and overflow use are counted per worker process and served by
+# GET /api/admin/db-pool.
+#
+#   DB_POOL_SIZE            connections kept open per process
+#   DB_MAX_OVERFLOW         extra connections allowed under load
+#   DB_POOL_TIMEOUT         seconds to wait for a connection before failing
+#   DB_POOL_RECYCLE         seconds after which a connection is replaced
+#   DB_POOL_PRE_PING        test connections on checkout (drops dead ones)
+#   DB_STATEMENT_TIMEOUT_MS PostgreSQL statement_timeout (0 = none)
+#   SQLITE_BUSY_TIMEOUT_MS  how long SQLite waits on a locked database
+
+# Checkouts slower than this are counted separately, for spotting stalls
+SLOW_WAIT_SECONDS = 0.05
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.slow_waits = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.connects = 0
+            self.invalidations = 0
+            self.peak_checked_out = 0
+            self.peak_overflow = 0
+
+    def checked_out(self, waited, pool):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if waited >= SLOW_WAIT_SECONDS:
+                self.slow_waits += 1
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def timed_out(self):
+        with self.lock:
+            self.timeouts += 1
+
+    def connected(self):
+        with self.lock:
+            self.connects += 1
+
+    def invalidated(self):
+        with self.lock:
+            self.invalidations += 1
+
+    def stats(self, pool=None):
+        with self.lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "slow_waits": self.slow_waits,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_avg": (
+                    round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0.0
+                ),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                {
+                    "size": pool.size(),
+                    "max_overflow": pool._max_overflow,
+                    "checked_out": pool.checkedout(),
+                    "checked_in": pool.checkedin(),
+                    # Negative while the pool hasn't opened all `size` connections yet
+                    "overflow": pool.overflow(),
+                }
+            )
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that times every checkout, including opening a new connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timed_out()
+            raise
+        pool_metrics.checked_out(time.perf_counter() - started, self)
+        return connection
+
+
+event.listen(MeteredQueuePool, "connect", lambda *args: pool_metrics.connected())
+event.listen(MeteredQueuePool, "invalidate", lambda *args: pool_metrics.invalidated())
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for config["SQLALCHEMY_DATABASE_URI"]."""
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri:
+        return {}
+    url = make_url(uri)
+    options = {}
+    connect_args = {}
+
+    if url.get_backend_name() == "sqlite":
+        # sqlite3's timeout is in seconds
+        connect_args["timeout"] = config["SQLITE_BUSY_TIMEOUT_MS"] / 1000
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases live in a single connection; no pool to size
+            return {"connect_args": connect_args}
+    elif url.get_backend_name() == "postgresql" and config["DB_STATEMENT_TIMEOUT_MS"]:
+        connect_args["options"] = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+        pool_pre_ping=config["DB_POOL_PRE_PING"],
+    )
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
@@ -0,0 +1,232 @@
+import argparse
+import csv
+import io
+import json
+import time
+from sqlalchemy import insert, Integer, Float, Boolean
+from models import db, Book
+from search import rebuild_search_index
+from catalog_cache import bump_catalog_version
+
+# Streaming catalog importer.
+# Records are read incrementally from a JSON array, NDJSON or the raw CSV
+# export, coerced to the Book column types, and inserted in fixed-size batches
+# (Core executemany, or COPY on PostgreSQL). Every batch commits on its own,
+# so one bad batch is reported and skipped instead of rolling back the run.
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Book columns we accept from the import file (id is always generated)
+BOOK_COLUMNS = [c for c in Book.__table__.columns if c.name != "id"]
+BOOK_COLUMN_NAMES = [c.name for c in BOOK_COLUMNS]
+
+
+def _to_int(value):
+    return int(float(value))
+
+
+def _to_float(value):
+    return float(str(value).replace("$", "").strip())
+
+
+def _to_bool(value):
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _converter(column):
+    if isinstance(column.type, Integer):
+        return _to_int
+    if isinstance(column.type, Float):
+        return _to_float
+    if isinstance(column.type, Boolean):
+        return _to_bool
+    return str
+
+
+# Built once instead of probing hasattr(Book, key) for every key of every row
+CONVERTERS = {c.name: _converter(c) for c in BOOK_COLUMNS}
+
+
+def normalize_record(item):
+    """Maps one raw record onto Book columns. Raises ValueError on bad values."""
+    row = dict.fromkeys(BOOK_COLUMN_NAMES)
+    for key, value in item.items():
+        convert = CONVERTERS.get(key)
+        if convert is None or value is None:
+            continue
+        if isinstance(value, str) and not value.strip():
+            continue
+        try:
+            row[key] = convert(value)
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid value for {key}: {value!r}")
+
+    # Missing copies means none on the shelf; both counters start identical
+    row["copies"] = row["copies"] or 0
+    row["availableCopies"] = row["copies"]
+    return row
+
+
+def iter_json_records(path, chunk_size=1 << 16):
+    """Yields records from a JSON array or NDJSON file without loading it whole."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        pos = len(buf) - len(buf.lstrip())
+
+        if buf[pos:pos + 1] != "[":
+            # NDJSON: one record per line
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        pos += 1
+        eof = False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError("Need more data", buf, pos)
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            yield item
+
+
+def iter_csv_records(path):
+    """Yields records from the raw CSV export, with camelCase column names."""
+    from cleanData import to_camel_case
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [to_camel_case(name) for name in next(reader)]
+        for values in reader:
+            yield dict(zip(header, values))
+
+
+def iter_records(path):
+    if path.lower().endswith(".csv"):
+        return iter_csv_records(path)
+    return iter_json_records(path)
+
+
+def _copy_batch(rows):
+    """PostgreSQL fast path: stream the batch through COPY ... FROM STDIN."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in BOOK_COLUMN_NAMES])
+    buf.seek(0)
+
+    columns = ", ".join(f'"{c}"' for c in BOOK_COLUMN_NAMES)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY book ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        cursor.close()
+
+
+def _insert_batch(rows):
+    if db.engine.dialect.name == "postgresql":
+        _copy_batch(rows)
+    else:
+        db.session.execute(insert(Book.__table__), rows)
+
+
+def import_books(path, batch_size=DEFAULT_BATCH_SIZE, log=print):
+    """
+    Imports every record in `path` in batches of `batch_size`.
+    Returns a report dict with row counts, per-batch errors and throughput.
+    """
+    report = {
+        "inserted": 0,
+        "skipped_rows": [],
+        "failed_batches": [],
+        "seconds": 0.0,
+        "rows_per_sec": 0.0,
+    }
+    started = time.perf_counter()
+    batch, batch_no, first_record = [], 0, None
+
+    def flush():
+        nonlocal batch_no
+        batch_no += 1
+        try:
+            _insert_batch(batch)
+            db.session.commit()
+            report["inserted"] += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            report["failed_batches"].append(
+                {
+                    "batch": batch_no,
+                    "first_record": first_record,
+                    "rows": len(batch),
+                    "error": str(e).splitlines()[0],
+                }
+            )
+            log(f"❌ Batch {batch_no} failed: {str(e).splitlines()[0]}")
+
+    for record_no, item in enumerate(iter_records(path), start=1):
+        try:
+            row = normalize_record(item)
+        except ValueError as e:
+            report["skipped_rows"].append({"record": record_no, "error": str(e)})
+            continue
+        if not batch:
+            first_record = record_no
+        batch.append(row)
+
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+            elapsed = time.perf_counter() - started
+            log(
+                f"  batch {batch_no}: {report['inserted']} rows "
+                f"({report['inserted'] / elapsed:,.0f} rows/sec)"
+            )
+
+    if batch:
+        flush()
+
+    # Derived structures are rebuilt once, not per row
+    rebuild_search_index()
+    bump_catalog_version()
+    db.session.commit()
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    if report["seconds"]:
+        report["rows_per_sec"] = round(report["inserted"] / report["seconds"], 1)
+
+    log(
+        f"✅ Imported {report['inserted']} books in {report['seconds']}s "
+        f"({report['rows_per_sec']:,.0f} rows/sec), "
+        f"{len(report['skipped_rows'])} rows skipped, "
+        f"{len(report['failed_batches'])} batches failed."
+    )
+    return report
+
+
+if __name__ == "__main__":
+    from app import create_app, init_database
+
+    parser = argparse.ArgumentParser(description="Bulk-import books into the catalog.")
+    parser.add_argument("path", help="books.json, NDJSON or the raw CSV export")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        init_database()  # no-op unless the database is new
+        import_books(args.path, batch_size=args.batch_size)
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, JobLease, JobRun
+from circulation import reconcile_counters, scan_overdue
+
+# Background jobs that must run once per interval across every process.
+# Each web worker may run a scheduler (RUN_JOBS=1); all of them poll every
+# JOBS_POLL_SECONDS, and a run starts only if its lease row can be claimed
+# with one conditional UPDATE: nobody holds it, and the last run started at
+# least one interval ago. The same row works on PostgreSQL and SQLite, and
+# unlike an advisory lock it also remembers when the job last ran, so
+# workers whose timers drift apart don't each run it once. A lease held by
+# a crashed process expires after LEASE_TTL.
+#
+#   python jobs.py list                    jobs, lease state, recent runs
+#   python jobs.py run overdue_check       run now, out of band
+#
+# Every run is recorded in job_runs with its start, duration, rows touched
+# and outcome (GET /api/admin/jobs shows the same).
+
+LEASE_TTL = timedelta(hours=1)
+# Schedulers fire on their own clocks; a poll this close to the interval counts
+INTERVAL_SLACK = timedelta(seconds=30)
+RECENT_RUNS = 10
+
+
+@dataclass(frozen=True)
+class Job:
+    name: str
+    run: Callable[[], dict]  # returns a report
+    interval: Optional[timedelta] = None  # None = only run from the CLI
+    rows_key: str = "rows"  # report entry counted as rows touched
+
+
+JOBS = {
+    job.name: job
+    for job in (
+        Job("overdue_check", scan_overdue, interval=timedelta(days=1)),
+        Job("reconcile_counters", reconcile_counters, rows_key="corrected"),
+    )
+}
+
+
+def process_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def ensure_lease(name):
+    if db.engine.dialect.name == "postgresql":
+        insert = postgresql.insert(JobLease)
+    else:
+        insert = sqlite.insert(JobLease)
+    db.session.execute(insert.values(name=name).on_conflict_do_nothing())
+
+
+def claim_lease(job, owner, now=None, due_only=True):
+    """
+    Takes the job's lease for `owner`. With `due_only` the job must also be
+    due (last started at least one interval ago). Returns whether we got it.
+    """
+    now = now or datetime.now(timezone.utc)
+    ensure_lease(job.name)
+    conditions = [
+        JobLease.name == job.name,
+        or_(JobLease.locked_until.is_(None), JobLease.locked_until < now),
+    ]
+    if due_only and job.interval is not None:
+        conditions.append(
+            or_(
+                JobLease.last_started_at.is_(None),
+                JobLease.last_started_at <= now - job.interval + INTERVAL_SLACK,
+            )
+        )
+    claimed = db.session.execute(
+        update(JobLease)
+        .where(*conditions)
+        .values(owner=owner, locked_until=now + LEASE_TTL, last_started_at=now)
+        .returning(JobLease.name)
+    ).first()
+    db.session.commit()
+    return claimed is not None
+
+
+def release_lease(name, owner):
+    db.session.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.owner == owner)
+        .values(locked_until=None)
+    )
+    db.session.commit()
+
+
+def run_job(name, trigger="schedule", owner=None):
+    """
+    Runs job `name` if its lease can be claimed and returns the JobRun, or
+    None when another process holds it (or, when scheduled, it isn't due).
+    """
+    job = JOBS[name]
+    owner = owner or process_owner()
+    if not claim_lease(job, owner, due_only=trigger == "schedule"):
+        return None
+
+    run = JobRun(
+        job=name, owner=owner, trigger=trigger, started_at=datetime.now(timezone.utc)
+    )
+    db.session.add(run)
+    db.session.commit()
+    run_id = run.id
+    started = time.perf_counter()
+    try:
+        report = job.run()
+        # Jobs own the session while they run; work on a row that is
+        # certainly attached to it
+        run = db.session.get(JobRun, run_id)
+        run.outcome = "ok"
+        run.rows = report.get(job.rows_key)
+        run.detail = json.dumps(report, default=str)
+    except Exception as e:
+        db.session.rollback()
+        run = db.session.get(JobRun, run_id)
+        run.outcome = "error"
+        run.detail = f"{type(e).__name__}: {e}"
+    finally:
+        run.finished_at = datetime.now(timezone.utc)
+        run.duration_seconds = round(time.perf_counter() - started, 3)
+        db.session.commit()
+        release_lease(name, owner)
+    return run
+
+
+def scheduled(app, name):
+    """APScheduler callable: one poll of job `name`."""
+
+    def poll():
+        with app.app_context():
+            run = run_job(name)
+            if run is not None:
+                print(
+                    f"Job {name}: {run.outcome}, {run.rows} rows "
+                    f"in {run.duration_seconds}s"
+                )
+
+    return poll
+
+
+def schedule_jobs(scheduler, app):
+    """Adds a poll for every interval job to an APScheduler instance."""
+    poll_seconds = app.config["JOBS_POLL_SECONDS"]
+    for job in JOBS.values():
+        if job.interval is None:
+            continue
+        scheduler.add_job(
+            id=job.name,
+            func=scheduled(app, job.name),
+            trigger="interval",
+            seconds=min(poll_seconds, job.interval.total_seconds()),
+            next_run_time=datetime.now(timezone.utc),
+        )
+
+
+def job_status(limit=RECENT_RUNS):
+    leases = {lease.name: lease for lease in db.session.scalars(select(JobLease))}
+    status = []
+    for job in JOBS.values():
+        lease = leases.get(job.name)
+        runs = db.session.scalars(
+            select(JobRun)
+            .where(JobRun.job == job.name)
+            .order_by(JobRun.started_at.desc(), JobRun.id.desc())
+            .limit(limit)
+        ).all()
+        status.append(
+            {
+                "job": job.name,
+                "interval_seconds": job.interval.total_seconds() if job.interval else None,
+                "owner": lease.owner if lease else None,
+                "locked_until": lease.locked_until if lease else None,
+                "last_started_at": lease.last_started_at if lease else None,
+                "runs": [run.to_dict() for run in runs],
+            }
+        )
+    return status
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Run or inspect background jobs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="jobs, lease state and recent runs")
+    run_parser = commands.add_parser("run", help="run a job now")
+    run_parser.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "list":
+            for entry in job_status(limit=5):
+                print(
+                    f"{entry['job']}: every {entry['interval_seconds'] or '-'}s, "
+                    f"last started {entry['last_started_at'] or 'never'}"
+                )
+                for run in entry["runs"]:
+                    print(
+                        f"  #{run['id']} {run['started_at']} {run['trigger']:8} "
+                        f"{run['outcome']:7} rows={run['rows']} {run['duration_seconds']}s"
+                    )
+        else:
+            run = run_job(args.job, trigger="cli")
+            if run is None:
+                print(f"{args.job} is running in another process; try again later.")
+                sys.exit(2)
+            # Report what job_runs holds, not what this process believes
+            db.session.expire_all()
+            run = db.session.get(JobRun, run.id)
+            if run.finished_at is None:
+                print(f"{args.job}: run #{run.id} finished but was not recorded")
+                sys.exit(1)
+            print(f"{args.job}: {run.outcome}, {run.rows} rows in {run.duration_seconds}s")
+            if run.outcome != "ok":
+                print(run.detail)
+                sys.exit(1)
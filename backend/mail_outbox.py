@@ -0,0 +1,204 @@
+import json
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask_mail import Message
+from sqlalchemy import or_, select, update
+from models import db, OutboxEmail
+
+# Transactional mail outbox.
+# Request handlers never talk to SMTP: enqueue_email() only adds a row to the
+# current session, so the email is committed (or rolled back) together with
+# the change that caused it. A small pool of background workers claims due
+# rows, sends them over one long-lived SMTP connection per worker and retries
+# failures with exponential backoff.
+#
+#   python mail_outbox.py      run the sender pool on its own
+#
+# For local testing point MAIL_SERVER/MAIL_PORT at a stand-in server, e.g.
+#   python -m aiosmtpd -n -l localhost:8025
+#   MAIL_SERVER=localhost MAIL_PORT=8025 MAIL_USE_TLS=0 python mail_outbox.py
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+# A claimed row whose worker died is handed out again after this long
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Close an idle SMTP connection instead of letting the server drop it
+IDLE_DISCONNECT_SECONDS = 60
+
+
+def enqueue_email(subject, body, recipients=None, bcc=None, sender=None):
+    """Queues an email in the current transaction. The caller commits."""
+    email = OutboxEmail(
+        subject=subject,
+        body=body,
+        recipients=json.dumps(list(recipients or [])),
+        bcc=json.dumps(list(bcc or [])),
+        sender=sender,
+    )
+    db.session.add(email)
+    return email
+
+
+def to_message(email):
+    return Message(
+        subject=email.subject,
+        sender=email.sender or None,
+        recipients=json.loads(email.recipients),
+        bcc=json.loads(email.bcc),
+        body=email.body,
+    )
+
+
+def claim_batch(batch_size):
+    """Atomically marks up to `batch_size` due emails as ours and returns them."""
+    now = datetime.now(timezone.utc)
+    due = or_(
+        (OutboxEmail.status == "pending") & (OutboxEmail.next_attempt_at <= now),
+        (OutboxEmail.status == "sending") & (OutboxEmail.claimed_at < now - CLAIM_TIMEOUT),
+    )
+    candidates = (
+        select(OutboxEmail.id)
+        .where(due)
+        .order_by(OutboxEmail.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)  # PostgreSQL; ignored on SQLite
+    )
+    ids = db.session.scalars(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(candidates.scalar_subquery()), due)
+        .values(status="sending", claimed_at=now)
+        .returning(OutboxEmail.id)
+    ).all()
+    db.session.commit()
+    if not ids:
+        return []
+    return db.session.scalars(
+        select(OutboxEmail).where(OutboxEmail.id.in_(ids)).order_by(OutboxEmail.id)
+    ).all()
+
+
+def mark_sent(email):
+    email.status = "sent"
+    email.sent_at = datetime.now(timezone.utc)
+    email.attempts += 1
+    email.last_error = None
+
+
+def mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:2000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = "failed"
+    else:
+        delay = BACKOFF_BASE_SECONDS * 2 ** (email.attempts - 1)
+        email.status = "pending"
+        email.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+
+class OutboxSender:
+    """One worker's SMTP connection, reused across batches until it idles out."""
+
+    def __init__(self, mail):
+        self.mail = mail
+        self.connection = None
+        self.last_used = 0.0
+
+    def send(self, message):
+        if self.connection is None:
+            self.connection = self.mail.connect().__enter__()
+        try:
+            self.connection.send(message)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+            # The server dropped us: reconnect once and retry this message
+            self.close()
+            self.connection = self.mail.connect().__enter__()
+            self.connection.send(message)
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self.connection and time.monotonic() - self.last_used > IDLE_DISCONNECT_SECONDS:
+            self.close()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except Exception:
+                pass
+            self.connection = None
+
+
+def drain_once(sender, batch_size=20):
+    """Sends one batch of due emails. Returns how many were attempted."""
+    batch = claim_batch(batch_size)
+    for email in batch:
+        try:
+            sender.send(to_message(email))
+            mark_sent(email)
+        except Exception as e:
+            sender.close()
+            mark_failed(email, e)
+        db.session.commit()
+    return len(batch)
+
+
+class OutboxWorkerPool:
+    def __init__(self, app, mail, workers=2, batch_size=20, poll_interval=2.0):
+        self.app = app
+        self.mail = mail
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"mail-outbox-{n}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=10):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _run(self):
+        sender = OutboxSender(self.mail)
+        with self.app.app_context():
+            while not self.stopping.is_set():
+                try:
+                    sent = drain_once(sender, self.batch_size)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Mail outbox batch failed")
+                    sent = 0
+                finally:
+                    db.session.remove()
+                if not sent:
+                    sender.close_if_idle()
+                    self.stopping.wait(self.poll_interval)
+            sender.close()
+
+
+if __name__ == "__main__":
+    from app import create_app, mail
+
+    app = create_app()
+    pool = OutboxWorkerPool(
+        app,
+        mail,
+        workers=app.config["MAIL_OUTBOX_WORKERS"] or 1,
+        batch_size=app.config["MAIL_OUTBOX_BATCH_SIZE"],
+    )
+    pool.start()
+    print(f"📬 Mail outbox running with {pool.workers} workers. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
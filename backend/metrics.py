@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-endpoint request metrics in Prometheus text format (GET /metrics).
+# A before/after_request pair times every request, and cursor-execute
+# listeners count the SQL statements and DB time spent on its behalf. A
+# request whose exception skipped after_request is recorded at teardown as
+# a 500. A request that runs more than QUERY_BUDGET statements is logged as
+# a warning, which is usually an N+1 pattern (a query per row in a loop).
+#
+# Numbers are per process. Under several gunicorn workers each scrape sees
+# one worker; scrape them individually or aggregate in Prometheus.
+# Streamed responses (the CSV/NDJSON exports) are timed until the response
+# starts, not until the last chunk is sent.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PREFIX = "libri"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": bound}, cumulative
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_metric(name, kind, help_text, samples):
+    """
+    Prometheus text for one metric family. `samples` yields
+    (sample name, labels dict, value).
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for sample_name, labels, value in samples:
+        if labels:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            sample_name = f"{sample_name}{{{label_text}}}"
+        lines.append(f"{sample_name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.db_seconds = defaultdict(float)
+        self.responses = defaultdict(int)
+        self.over_budget = defaultdict(int)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        _listen_for_queries()
+
+    @staticmethod
+    def _start():
+        g.metrics_started = time.perf_counter()
+        g.query_count = 0
+        g.query_seconds = 0.0
+
+    def _finish(self, response):
+        self._record(response.status_code)
+        return response
+
+    def _teardown(self, exc=None):
+        # after_request never ran: the view raised and the exception
+        # propagated (debug, testing, PROPAGATE_EXCEPTIONS) or an
+        # after_request hook failed. The client gets a 500 either way.
+        self._record(500)
+
+    def _record(self, status):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        queries = g.get("query_count", 0)
+
+        with self.lock:
+            self.latency[(endpoint, request.method)].observe(elapsed)
+            self.queries[endpoint].observe(queries)
+            self.db_seconds[endpoint] += g.get("query_seconds", 0.0)
+            self.responses[(endpoint, request.method, status)] += 1
+
+        budget = current_app.config["QUERY_BUDGET"]
+        if budget and queries > budget:
+            with self.lock:
+                self.over_budget[endpoint] += 1
+            current_app.logger.warning(
+                "%s %s ran %d SQL statements (budget %d) in %.1f ms",
+                request.method,
+                request.path,
+                queries,
+                budget,
+                elapsed * 1000,
+            )
+
+    def render(self):
+        with self.lock:
+            return "".join(
+                [
+                    format_metric(
+                        f"{PREFIX}_http_request_duration_seconds",
+                        "histogram",
+                        "Request latency by endpoint.",
+                        (
+                            sample
+                            for (endpoint, method), histogram in self.latency.items()
+                            for sample in histogram.samples(
+                                f"{PREFIX}_http_request_duration_seconds",
+                                {"endpoint": endpoint, "method": method},
+                            )
+                        ),
+                    ),
+                    format_metric(
+                        f"{PREFIX}_http_responses_total",
+                        "counter",
+                        "Responses by endpoint and status code.",
+                        (
+                            (
+                                f"{PREFIX}_http_responses_total",
+                                {"endpoint": endpoint, "method": method, "status": status},
+                                count,
+                            )
+                            for (endpoint, method, status), count in self.responses.items()
+                        ),
+                    ),
+                    format_metric(
+                        f"{PREFIX}_db_queries_per_request",
+                        "histogram",
+                        "SQL statements executed per request.",
+                        (
+                            sample
+                            for endpoint, histogram in self.queries.items()
+                            for sample in histogram.samples(
+                                f"{PREFIX}_db_queries_per_request", {"endpoint": endpoint}
+                            )
+                        ),
+                    ),
+                    format_metric(
+                        f"{PREFIX}_db_seconds_total",
+                        "counter",
+                        "Time spent executing SQL, by endpoint.",
+                        (
+                            (f"{PREFIX}_db_seconds_total", {"endpoint": endpoint}, seconds)
+                            for endpoint, seconds in self.db_seconds.items()
+                        ),
+                    ),
+                    format_metric(
+                        f"{PREFIX}_query_budget_exceeded_total",
+                        "counter",
+                        "Requests that ran more SQL statements than QUERY_BUDGET.",
+                        (
+                            (f"{PREFIX}_query_budget_exceeded_total", {"endpoint": endpoint}, n)
+                            for endpoint, n in self.over_budget.items()
+                        ),
+                    ),
+                ]
+            )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    # Statements outside a request (jobs, CLI) aren't attributed to anything
+    if has_request_context() and "query_count" in g:
+        g.query_count += 1
+        g.query_seconds += time.perf_counter() - started
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def _listen_for_queries():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+request_metrics = RequestMetrics()
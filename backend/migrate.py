@@ -0,0 +1,294 @@
+import argparse
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.schema import CreateIndex
+from models import db, Book, BorrowRecord
+from circulation import (
+    ACTIVE_LOAN_INDEX,
+    active_loans_query,
+    book_loans_query,
+    counters_by_user_query,
+    counters_query,
+    loan_history_query,
+    overdue_loans_query,
+    reconcile_counters,
+)
+from dashboard import TOP_TITLES, loans_per_day_query, overdue_count_query, top_titles_query
+
+# Brings an existing database up to the columns and indexes on the models.
+# db.create_all() only creates missing tables, so nullable columns and
+# indexes added to a table that already exists have to be created here.
+# On PostgreSQL indexes are built CONCURRENTLY so a large borrow_records
+# table stays writable meanwhile; a build that fails leaves an INVALID
+# index, which is dropped so the next run retries it. Duplicate active
+# loans, left by the old unguarded borrow, are closed before the unique
+# active-loan index is built, and a unique index that still can't be
+# built fails the upgrade (non-zero exit).
+#
+#   python migrate.py                 add missing columns and indexes
+#   python migrate.py --check-plans   fail if a circulation or dashboard query
+#                                     scans borrow_records instead of an index
+#   python migrate.py --check-plans --scratch
+#                                     the same against a fresh SQLite schema,
+#                                     no database needed (the CI plan check)
+
+
+def missing_columns():
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                yield table, column
+
+
+def add_columns(log=print):
+    """Adds declared columns the database lacks. Only nullable ones are safe."""
+    added = []
+    preparer = db.engine.dialect.identifier_preparer
+    for table, column in list(missing_columns()):
+        name = f"{table.name}.{column.name}"
+        if not column.nullable:
+            log(f"❌ Cannot add NOT NULL column {name} automatically")
+            continue
+        column_type = column.type.compile(dialect=db.engine.dialect)
+        ddl = (
+            f"ALTER TABLE {preparer.quote(table.name)} "
+            f"ADD COLUMN {preparer.quote(column.name)} {column_type}"
+        )
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(ddl)
+        added.append(name)
+        log(f"✅ Added column {name}")
+    return added
+
+
+def missing_indexes():
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                yield index
+
+
+class MigrationError(Exception):
+    """A unique index could not be built, so the rule it enforces is off."""
+
+
+def drop_invalid_indexes(log=print):
+    """
+    Drops declared indexes PostgreSQL left INVALID after a failed concurrent
+    build. They exist by name but enforce and serve nothing; once dropped,
+    missing_indexes() picks them up for a rebuild.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return []
+    declared = {ix.name for table in db.metadata.sorted_tables for ix in table.indexes}
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE NOT i.indisvalid AND pg_table_is_visible(c.oid)"
+            )
+        ).scalars()
+        dropped = sorted(name for name in invalid if name in declared)
+        preparer = db.engine.dialect.identifier_preparer
+        for name in dropped:
+            conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {preparer.quote(name)}")
+            log(f"⚠️ Dropped invalid index {name}")
+    return dropped
+
+
+def close_duplicate_loans(log=print):
+    """
+    Closes every active loan but the oldest of each (user, book) pair, which
+    ACTIVE_LOAN_INDEX cannot be built over, and puts those copies back on
+    the shelf. Returns how many loans were closed.
+    """
+    oldest = (
+        select(func.min(BorrowRecord.id))
+        .where(BorrowRecord.status == "borrowed")
+        .group_by(BorrowRecord.user_id, BorrowRecord.book_id)
+    )
+    duplicates = db.session.execute(
+        select(BorrowRecord.id, BorrowRecord.book_id).where(
+            BorrowRecord.status == "borrowed", BorrowRecord.id.not_in(oldest)
+        )
+    ).all()
+    if not duplicates:
+        return 0
+
+    try:
+        db.session.execute(
+            update(BorrowRecord)
+            .where(BorrowRecord.id.in_([row.id for row in duplicates]))
+            .values(status="returned", return_date=datetime.now(timezone.utc))
+        )
+        for book_id, copies in Counter(row.book_id for row in duplicates).items():
+            db.session.execute(
+                update(Book)
+                .where(Book.id == book_id)
+                .values(availableCopies=Book.availableCopies + copies)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    reconcile_counters()
+    log(f"⚠️ Closed {len(duplicates)} duplicate active loans")
+    return len(duplicates)
+
+
+def upgrade(log=print):
+    """
+    Adds missing columns, then every declared index the database lacks.
+    Raises MigrationError when a unique index could not be created.
+    """
+    add_columns(log)
+    drop_invalid_indexes(log)
+    missing = list(missing_indexes())
+    if any(index.name == ACTIVE_LOAN_INDEX for index in missing):
+        close_duplicate_loans(log)
+
+    created = []
+    failed = []
+    for index in missing:
+        ddl = str(CreateIndex(index).compile(dialect=db.engine.dialect))
+        try:
+            if db.engine.dialect.name == "postgresql":
+                ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+                with db.engine.connect().execution_options(
+                    isolation_level="AUTOCOMMIT"
+                ) as conn:
+                    conn.exec_driver_sql(ddl)
+            else:
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql(ddl)
+            created.append(index.name)
+            log(f"✅ Created index {index.name}")
+        except Exception as e:
+            log(f"❌ Could not create index {index.name}: {str(e).splitlines()[0]}")
+            if index.unique:
+                failed.append(index.name)
+    # A failed CONCURRENTLY build leaves an INVALID index; drop it now so
+    # the next run retries instead of trusting it
+    drop_invalid_indexes(log)
+    if failed:
+        raise MigrationError(f"Could not create unique index {', '.join(failed)}")
+    return created
+
+
+# Aggregates over the whole table; they need an index to read, not to search
+FULL_PASSES = {"reconcile_counters", "admin_summary: top titles"}
+
+
+def circulation_queries():
+    """
+    The borrow_records queries behind the circulation endpoints, the overdue
+    scan and the dashboard, built by the same functions the app runs.
+    """
+    now = datetime.now(timezone.utc)
+    return {
+        "seed_counters": counters_query(1),
+        "reconcile_counters": counters_by_user_query(),
+        "get_my_borrowed_books": active_loans_query(1, Book, BorrowRecord),
+        "get_borrow_history": loan_history_query(1, Book, BorrowRecord),
+        "delete_book: active loans": book_loans_query(1),
+        "scan_overdue": overdue_loans_query(now),
+        "admin_summary: overdue loans": overdue_count_query(now),
+        "admin_summary: loans per day": loans_per_day_query(now),
+        "admin_summary: top titles": top_titles_query(TOP_TITLES),
+    }
+
+
+def explain(conn, stmt):
+    """Returns the plan text for `stmt`, compiled with real bind parameters."""
+    dialect = db.engine.dialect
+    compiled = stmt.compile(dialect=dialect)
+    params = compiled.construct_params()
+
+    if dialect.name == "postgresql":
+        # Tiny dev tables make a seq scan "cheapest"; ask what it would use
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = conn.exec_driver_sql(f"EXPLAIN {compiled.string}", params)
+        return "\n".join(row[0] for row in rows)
+
+    positional = tuple(params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", positional)
+    return "\n".join(row[-1] for row in rows)
+
+
+def scans_borrow_records(plan, full_pass=False):
+    """
+    With `full_pass` (an aggregate over every loan) walking a whole index is
+    expected on SQLite; only a scan of the table itself fails.
+    """
+    if db.engine.dialect.name == "postgresql":
+        return "Seq Scan on borrow_records" in plan
+    return any(
+        line.strip().startswith("SCAN borrow_records")
+        and not (full_pass and " INDEX " in line)
+        for line in plan.splitlines()
+    )
+
+
+def check_plans(log=print):
+    """Returns True when every circulation query is served by an index."""
+    ok = True
+    with db.engine.begin() as conn:
+        for name, stmt in circulation_queries().items():
+            plan = explain(conn, stmt)
+            if scans_borrow_records(plan, full_pass=name in FULL_PASSES):
+                ok = False
+                log(f"❌ {name} scans borrow_records:\n{plan}")
+            else:
+                log(f"✅ {name}")
+    return ok
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations.")
+    parser.add_argument(
+        "--check-plans",
+        action="store_true",
+        help="verify circulation queries use indexes (non-zero exit otherwise)",
+    )
+    parser.add_argument(
+        "--scratch",
+        action="store_true",
+        help="check the plans on an empty SQLite schema instead of the database",
+    )
+    args = parser.parse_args()
+
+    if args.scratch:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "plans.db")
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+            with app.app_context():
+                db.create_all()
+                ok = check_plans()
+                db.engine.dispose()
+        sys.exit(0 if ok else 1)
+
+    app = create_app()
+
+    with app.app_context():
+        try:
+            upgrade()
+        except MigrationError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if args.check_plans and not check_plans():
+            sys.exit(1)
@@ -1,8 +1,10 @@
 import random
 import string
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta, timezone
+from serializers import Serializer, as_day_or_na
 
 db = SQLAlchemy()
 
@@ -43,20 +45,23 @@ class User(db.Model):
         return "".join(random.choices(string.ascii_uppercase + string.digits, k=5))
 
     def to_dict(self):
-        return {
-            "id": self.id,
-            "full_name": self.full_name,
-            "email": self.email,
-            "role": self.role,
-            "is_verified": self.is_verified,
-            "phone": self.phone,
-            "own_invite_code": self.own_invite_code,
-            "registration_date": (
-                self.registration_date.strftime("%Y-%m-%d")
-                if self.registration_date
-                else "N/A"
-            ),
-        }
+        return USER_SERIALIZER.obj(self)
+
+
+class TokenRevocation(db.Model):
+    """Tokens issued to `user_id` before `revoked_at` are no longer accepted."""
+
+    __tablename__ = "token_revocations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: deleting the user must not delete the revocation
+    user_id = db.Column(db.Integer, nullable=False)
+    revoked_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+        index=True,
+    )
 
 
 class Book(db.Model):
@@ -122,14 +127,68 @@ class Book(db.Model):
     listPriceUsd = db.Column(db.Float)  # The numeric price
     purchasePriceUsd = db.Column(db.Float)
 
-    def to_dict(self):
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+    def to_dict(self, fields=None):
+        """All columns, or only `fields` (the columns a load_only query loaded)."""
+        return book_serializer(tuple(fields) if fields else None).obj(self)
 
     # --- ADD THIS TO app.py ---
 
 
+@lru_cache(maxsize=128)
+def book_serializer(fields=None):
+    """Serializer for a tuple of Book column names (None = every column)."""
+    table = Book.__table__
+    names = fields or table.columns.keys()
+    return Serializer([table.c[name] for name in names])
+
+
+USER_SERIALIZER = Serializer(
+    [
+        User.id,
+        User.full_name,
+        User.email,
+        User.role,
+        User.is_verified,
+        User.phone,
+        User.own_invite_code,
+        User.registration_date,
+    ],
+    converters={"registration_date": as_day_or_na},
+)
+
+
+class CatalogState(db.Model):
+    """Single-row table holding the catalog version, bumped on every Book write."""
+
+    __tablename__ = "catalog_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
 class BorrowRecord(db.Model):
     __tablename__ = "borrow_records"  # Good practice to name the table
+    __table_args__ = (
+        # Per-user circulation: active count, stats, my books, history
+        db.Index(
+            "ix_borrow_records_user_status_return", "user_id", "status", "return_date"
+        ),
+        # One active loan per user and book; also serves the duplicate check
+        db.Index(
+            "uq_borrow_records_active_user_book",
+            "user_id",
+            "book_id",
+            unique=True,
+            sqlite_where=db.text("status = 'borrowed'"),
+            postgresql_where=db.text("status = 'borrowed'"),
+        ),
+        # Active loans of a book (delete_book safety check)
+        db.Index("ix_borrow_records_book_status", "book_id", "status"),
+        # Overdue scan: status = 'borrowed' AND due_date < ?
+        db.Index("ix_borrow_records_status_due", "status", "due_date"),
+        # Admin summary: loans started per day over a recent window
+        db.Index("ix_borrow_records_borrow_date", "borrow_date"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -151,7 +210,35 @@ class BorrowRecord(db.Model):
     book = db.relationship("Book", backref="borrow_history")
     renewed = db.Column(db.Boolean, default=False)  # Add this line
 
-    
+    # Due date the last overdue reminder covered, so reruns don't re-send
+    # (a renewal moves due_date on, which makes the loan eligible again)
+    reminded_for_due = db.Column(db.DateTime, nullable=True)
+
+
+class UserCirculation(db.Model):
+    """
+    Per-user loan counters, kept in step with borrow_records by circulation.py
+    in the same transaction as each borrow, return and renewal.
+    Rebuild with `python circulation.py reconcile` if they ever drift.
+    """
+
+    __tablename__ = "user_circulation"
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    active_loans = db.Column(db.Integer, nullable=False, default=0)
+    returned_total = db.Column(db.Integer, nullable=False, default=0)
+    renewed_total = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "active": self.active_loans,
+            "total": self.returned_total,
+            "renewed": self.renewed_total,
+        }
+
+
 
 
 from datetime import datetime, timezone
@@ -173,3 +260,78 @@ class ContactMessage(db.Model):
             "message": self.message,
             "date": self.created_at.strftime("%Y-%m-%d %H:%M")
         }
+
+
+class OutboxEmail(db.Model):
+    """An email waiting to be sent, written in the same transaction as its cause."""
+
+    __tablename__ = "mail_outbox"
+    __table_args__ = (db.Index("ix_mail_outbox_status_next", "status", "next_attempt_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(500), nullable=False)
+    sender = db.Column(db.String(255), nullable=True)  # None = MAIL_DEFAULT_SENDER
+    recipients = db.Column(db.Text, nullable=False, default="[]")  # JSON list
+    bcc = db.Column(db.Text, nullable=False, default="[]")  # JSON list
+    body = db.Column(db.Text, nullable=False)
+
+    # "pending" -> "sending" -> "sent", or back to "pending" with a backoff,
+    # and "failed" once the retry budget is used up
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    claimed_at = db.Column(db.DateTime(timezone=True))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(
+        db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    sent_at = db.Column(db.DateTime(timezone=True))
+
+
+class JobLease(db.Model):
+    """
+    One row per scheduled job. Whoever moves `locked_until` into the future
+    runs the job; `last_started_at` keeps it to one run per interval.
+    """
+
+    __tablename__ = "job_leases"
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(255))
+    locked_until = db.Column(db.DateTime(timezone=True))
+    last_started_at = db.Column(db.DateTime(timezone=True))
+
+
+class JobRun(db.Model):
+    """One execution of a job, scheduled or from the CLI."""
+
+    __tablename__ = "job_runs"
+    __table_args__ = (db.Index("ix_job_runs_job_started", "job", "started_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(100), nullable=False)
+    owner = db.Column(db.String(255))
+    trigger = db.Column(db.String(20), nullable=False, default="schedule")  # or "cli"
+    started_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True))
+    duration_seconds = db.Column(db.Float)
+    rows = db.Column(db.Integer)
+    # "running" -> "ok" or "error"
+    outcome = db.Column(db.String(20), nullable=False, default="running")
+    detail = db.Column(db.Text)  # the job's report (JSON) or the error
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "job": self.job,
+            "owner": self.owner,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration_seconds,
+            "rows": self.rows,
+            "outcome": self.outcome,
+            "detail": self.detail,
+        }
@@ -0,0 +1,104 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing off the request threads.
+# scrypt/pbkdf2 are deliberately slow, so a burst of logins would otherwise
+# pin every CPU a web worker has. Hashes are computed in a small process pool
+# instead; at most `max_pending` hashes may be queued or running, and callers
+# beyond that, or whose hash isn't done within `timeout` seconds, get
+# PasswordHasherBusy (a 503) rather than piling up.
+# Hashes made with older cost parameters are upgraded on the next successful
+# login, so changing PASSWORD_HASH_METHOD needs no migration.
+#
+# PASSWORD_HASH_METHOD takes werkzeug's method strings, e.g.
+#   scrypt:32768:8:1     (werkzeug's default)
+#   pbkdf2:sha256:600000
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes are already queued; the caller should retry shortly."""
+
+
+def hash_method(pwhash):
+    """The method and cost parameters a stored hash was made with."""
+    return pwhash.split("$", 1)[0]
+
+
+def _noop():
+    return None
+
+
+class PasswordHasher:
+    def __init__(self, method="scrypt", workers=2, max_pending=64, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = None
+        self.lock = threading.Lock()
+        self._canonical_method = None
+
+    def start(self):
+        """
+        Starts the worker processes. Call it before the app starts background
+        threads so the workers are forked from a single-threaded process.
+        """
+        with self.lock:
+            if self.workers and self.executor is None:
+                context = None
+                if "fork" in multiprocessing.get_all_start_methods():
+                    # spawn/forkserver would re-import the app in every worker
+                    context = multiprocessing.get_context("fork")
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=context)
+                self.executor.submit(_noop).result()
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if self.executor is None:
+            self.start()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next caller
+            self.slots.release()
+            self.shutdown()
+            raise
+        # The slot is held until the hash really finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued behind other hashes: drop it. One already running
+            # can't be stopped and keeps its slot until it finishes.
+            future.cancel()
+            raise PasswordHasherBusy()
+
+    @property
+    def canonical_method(self):
+        # "scrypt" expands to "scrypt:32768:8:1" etc. in the stored hash
+        if self._canonical_method is None:
+            self._canonical_method = hash_method(generate_password_hash("", self.method))
+        return self._canonical_method
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Returns (matches, needs_rehash)."""
+        matches = self._run(check_password_hash, pwhash, password)
+        return matches, matches and self.needs_rehash(pwhash)
+
+    def needs_rehash(self, pwhash):
+        return hash_method(pwhash) != self.canonical_method
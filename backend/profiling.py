@@ -0,0 +1,205 @@
+import cProfile
+import glob
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from auth import caller_claims
+
+# On-demand profiling of a single request. An admin sends the request with
+# an "X-Profile: 1" header (or ?_profile=1) and it runs under cProfile while
+# a sampler thread records its stack every PROFILE_SAMPLE_MS. Both land in
+# PROFILE_DIR, which keeps the newest PROFILE_KEEP profiles:
+#   <id>.pstats      python -m pstats <file>, snakeviz, ...
+#   <id>.collapsed   "frame;frame;frame count" lines for flamegraph.pl,
+#                    speedscope or inferno
+#   <id>.json        endpoint, status, duration, SQL count
+# The response carries the id in X-Profile-Id; GET /api/admin/profiles
+# lists them and /api/admin/profiles/<id>/<pstats|collapsed> downloads one.
+#
+# Requests without the header or flag pay for two dict lookups. The flag is
+# ignored unless the caller's token belongs to a verified admin. One request
+# per process is profiled at a time (cProfile can't run two profilers at
+# once on Python 3.12+); a second one gets 409 while it runs. Streamed
+# responses (the exports) are profiled until the response starts. The
+# sampler only runs when the request thread releases the GIL (at least
+# every 5 ms), so short requests get few samples; the pstats file is exact.
+
+PROFILE_KINDS = {"pstats": ".pstats", "collapsed": ".collapsed"}
+_PROFILE_ID = re.compile(r"^[\w-]+$")
+
+
+def _requested():
+    return "X-Profile" in request.headers or "_profile" in request.args
+
+
+def _caller_is_admin():
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return False  # bad tokens are the view's business, not ours
+    if get_jwt_identity() is None:
+        return False
+    claims = caller_claims()
+    return claims.get("role") == "admin" and bool(claims.get("verified"))
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Counts the collapsed stacks of one thread, sampled every `interval`."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.lock = threading.Lock()  # held while a request is profiled
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+
+    def _start(self):
+        if not _requested() or not _caller_is_admin():
+            return None
+        if not self.lock.acquire(blocking=False):
+            return jsonify({"error": "Another request is being profiled"}), 409
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler (a debugger, coverage) is active
+            self.lock.release()
+            return jsonify({"error": "Another profiler is active"}), 409
+        sampler = StackSampler(
+            threading.get_ident(), current_app.config["PROFILE_SAMPLE_MS"] / 1000
+        )
+        g.profiling = (profile, sampler, time.perf_counter())
+        sampler.start()
+        return None
+
+    def _finish(self, response):
+        state = g.pop("profiling", None)
+        if state is None:
+            return response
+        profile, sampler, started = state
+        profile.disable()
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+        self.lock.release()
+
+        profile_id = "-".join(
+            (
+                datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f"),
+                (request.endpoint or "unmatched").replace(".", "_"),
+                secrets.token_hex(3),
+            )
+        )
+        self.save(
+            profile_id,
+            profile,
+            sampler,
+            {
+                "id": profile_id,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "endpoint": request.endpoint,
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 3),
+                "queries": g.get("query_count"),
+                "samples": sum(sampler.stacks.values()),
+                "sample_ms": current_app.config["PROFILE_SAMPLE_MS"],
+            },
+        )
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    def _discard(self, exc=None):
+        # The request failed before after_request; don't leave them running
+        state = g.pop("profiling", None)
+        if state is not None:
+            state[0].disable()
+            state[1].stop()
+            self.lock.release()
+
+    @staticmethod
+    def directory():
+        return current_app.config["PROFILE_DIR"]
+
+    def path_for(self, profile_id, kind):
+        if not _PROFILE_ID.match(profile_id) or kind not in PROFILE_KINDS:
+            return None
+        path = os.path.join(self.directory(), profile_id + PROFILE_KINDS[kind])
+        return path if os.path.exists(path) else None
+
+    def save(self, profile_id, profile, sampler, meta):
+        directory = self.directory()
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, profile_id)
+        profile.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w") as f:
+            f.write(sampler.collapsed())
+        # The metadata is written last, so it marks a complete profile
+        with open(base + ".json", "w") as f:
+            json.dump(meta, f)
+        self.prune(current_app.config["PROFILE_KEEP"])
+
+    def prune(self, keep):
+        # Ids start with the UTC timestamp, so name order is age order
+        finished = sorted(glob.glob(os.path.join(self.directory(), "*.json")))
+        for meta_path in finished[: max(0, len(finished) - keep)]:
+            base = meta_path[: -len(".json")]
+            for suffix in (".json", *PROFILE_KINDS.values()):
+                try:
+                    os.remove(base + suffix)
+                except OSError:
+                    pass
+
+    def list(self):
+        profiles = []
+        for meta_path in sorted(
+            glob.glob(os.path.join(self.directory(), "*.json")), reverse=True
+        ):
+            try:
+                with open(meta_path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # pruned by another worker meanwhile
+        return profiles
+
+
+request_profiler = RequestProfiler()
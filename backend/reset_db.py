@@ -1,32 +1,40 @@
-from app import db, app, User
+from models import db, User
+from search import drop_search_index, ensure_search_index
+from catalog_cache import ensure_catalog_state
 from datetime import datetime, timezone
 
 def rebuild_database():
-    with app.app_context():
-        print("--- Starting Database Reset ---")
-        
-        # 1. Clear everything
-        db.drop_all()
-        print("Tables dropped.")
-        
-        # 2. Re-create with new limits (VARCHAR 512, etc.)
-        db.create_all()
-        print("Tables created.")
+    # Runs in the caller's app context (flask --app app reset-db, or below)
+    print("--- Starting Database Reset ---")
+    
+    # 1. Clear everything (the search index references the book table)
+    drop_search_index()
+    db.drop_all()
+    print("Tables dropped.")
+    
+    # 2. Re-create with new limits (VARCHAR 512, etc.)
+    db.create_all()
+    ensure_search_index()
+    ensure_catalog_state()
+    print("Tables created.")
 
-        # # 3. Seed: Create a Default Admin
-        # admin = User(
-        #     full_name="Library Admin",
-        #     email="admin@example.com",
-        #     role="admin",
-        #     is_verified=True,
-        #     own_invite_code="ADMIN"
-        # )
-        # admin.set_password("admin123") # Use a better password later!
-        
-        # db.session.add(admin)
-        # db.session.commit()
-        
-        print("✅ Database reset!")
+    # # 3. Seed: Create a Default Admin
+    # admin = User(
+    #     full_name="Library Admin",
+    #     email="admin@example.com",
+    #     role="admin",
+    #     is_verified=True,
+    #     own_invite_code="ADMIN"
+    # )
+    # admin.set_password("admin123") # Use a better password later!
+    
+    # db.session.add(admin)
+    # db.session.commit()
+    
+    print("✅ Database reset!")
 
 if __name__ == "__main__":
-    rebuild_database()
\ No newline at end of file
+    from app import create_app
+
+    with create_app().app_context():
+        rebuild_database()
@@ -0,0 +1,201 @@
+import re
+from sqlalchemy import bindparam, text, Float, Integer
+from models import db
+
+# Full-text index over the searchable Book columns.
+# SQLite uses an FTS5 virtual table keyed by the book id (rowid),
+# PostgreSQL uses a side table holding a weighted tsvector with a GIN index.
+# Both are kept in sync explicitly from the routes that write to Book.
+
+SEARCH_COLUMNS = [
+    "title",
+    "subtitle",
+    "author",
+    "authorLastFirst",
+    "series",
+    "summary",
+    "tags",
+    "isbn",
+]
+
+# bm25 weights, in SEARCH_COLUMNS order (title and isbn matter most)
+FTS5_WEIGHTS = [10.0, 4.0, 6.0, 6.0, 4.0, 1.0, 2.0, 8.0]
+
+# tsvector weight class per column for PostgreSQL
+TSVECTOR_WEIGHTS = {
+    "title": "A",
+    "isbn": "A",
+    "subtitle": "B",
+    "author": "B",
+    "authorLastFirst": "B",
+    "series": "B",
+    "tags": "C",
+    "summary": "D",
+}
+
+MAX_SEARCH_TERMS = 8
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _quoted(column):
+    # Book columns are camelCase, so PostgreSQL needs them quoted
+    return f'"{column}"'
+
+
+def _tsvector_sql():
+    parts = [
+        f"setweight(to_tsvector('simple', coalesce(book.{_quoted(c)}, '')), "
+        f"'{TSVECTOR_WEIGHTS[c]}')"
+        for c in SEARCH_COLUMNS
+    ]
+    return " || ".join(parts)
+
+
+def _fts5_select_sql():
+    columns = ", ".join(f"coalesce({_quoted(c)}, '')" for c in SEARCH_COLUMNS)
+    return f"SELECT id, {columns} FROM book"
+
+
+def ensure_search_index():
+    """Creates the search index if it is missing and backfills it once."""
+    if _dialect() == "postgresql":
+        exists = db.session.execute(
+            text("SELECT to_regclass('book_search') IS NOT NULL")
+        ).scalar()
+        if not exists:
+            db.session.execute(
+                text(
+                    "CREATE TABLE book_search ("
+                    " book_id INTEGER PRIMARY KEY REFERENCES book(id) ON DELETE CASCADE,"
+                    " document tsvector NOT NULL)"
+                )
+            )
+            db.session.execute(
+                text(
+                    "CREATE INDEX ix_book_search_document "
+                    "ON book_search USING GIN (document)"
+                )
+            )
+            rebuild_search_index()
+    else:
+        exists = db.session.execute(
+            text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_fts'"
+            )
+        ).first()
+        if not exists:
+            columns = ", ".join(SEARCH_COLUMNS)
+            db.session.execute(
+                text(
+                    f"CREATE VIRTUAL TABLE book_fts USING fts5({columns}, "
+                    "tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            )
+            rebuild_search_index()
+    db.session.commit()
+
+
+def drop_search_index():
+    if _dialect() == "postgresql":
+        db.session.execute(text("DROP TABLE IF EXISTS book_search"))
+    else:
+        db.session.execute(text("DROP TABLE IF EXISTS book_fts"))
+    db.session.commit()
+
+
+def rebuild_search_index():
+    """Re-indexes the whole catalog in one set-based statement."""
+    if _dialect() == "postgresql":
+        db.session.execute(text("TRUNCATE book_search"))
+        db.session.execute(
+            text(
+                f"INSERT INTO book_search (book_id, document) "
+                f"SELECT book.id, {_tsvector_sql()} FROM book"
+            )
+        )
+    else:
+        columns = ", ".join(SEARCH_COLUMNS)
+        db.session.execute(text("DELETE FROM book_fts"))
+        db.session.execute(
+            text(f"INSERT INTO book_fts (rowid, {columns}) {_fts5_select_sql()}")
+        )
+
+
+def index_book(book_id):
+    """Re-indexes one book. Call after the change is flushed, before commit."""
+    index_books([book_id])
+
+
+def index_books(book_ids):
+    """Re-indexes a set of books in one statement per backend."""
+    ids = {"ids": list(book_ids)}
+    if _dialect() == "postgresql":
+        db.session.execute(
+            text(
+                f"INSERT INTO book_search (book_id, document) "
+                f"SELECT book.id, {_tsvector_sql()} FROM book "
+                f"WHERE book.id IN :ids "
+                f"ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document"
+            ).bindparams(bindparam("ids", expanding=True)),
+            ids,
+        )
+    else:
+        columns = ", ".join(SEARCH_COLUMNS)
+        db.session.execute(
+            text("DELETE FROM book_fts WHERE rowid IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            ids,
+        )
+        db.session.execute(
+            text(
+                f"INSERT INTO book_fts (rowid, {columns}) "
+                f"{_fts5_select_sql()} WHERE id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            ids,
+        )
+
+
+def unindex_book(book_id):
+    if _dialect() == "postgresql":
+        db.session.execute(
+            text("DELETE FROM book_search WHERE book_id = :id"), {"id": book_id}
+        )
+    else:
+        db.session.execute(text("DELETE FROM book_fts WHERE rowid = :id"), {"id": book_id})
+
+
+def search_terms(query):
+    """Splits user input into plain word tokens, dropping any query syntax."""
+    return re.findall(r"\w+", query.lower())[:MAX_SEARCH_TERMS]
+
+
+def ranked_matches(query):
+    """
+    Returns a subquery of (id, rank) for books matching every term, using
+    prefix matching on each term. Lower rank sorts first on both backends.
+    Returns None when the query has no searchable terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+
+    if _dialect() == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        stmt = text(
+            "SELECT book_id AS id, -ts_rank_cd(document, q) AS rank "
+            "FROM book_search, to_tsquery('simple', :tsquery) AS q "
+            "WHERE document @@ q"
+        ).bindparams(tsquery=tsquery)
+    else:
+        match = " ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(w) for w in FTS5_WEIGHTS)
+        stmt = text(
+            f"SELECT rowid AS id, bm25(book_fts, {weights}) AS rank "
+            f"FROM book_fts WHERE book_fts MATCH :match"
+        ).bindparams(match=match)
+
+    return stmt.columns(id=Integer, rank=Float).subquery("matches")
@@ -0,0 +1,91 @@
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+# Row serializers compiled once per model and projection.
+# A Serializer generates a plain function per column list, e.g.
+#   def serialize(row): return {'id': row[0], 'title': row[1], ...}
+# so turning a row into a dict is one dict display with positional lookups
+# instead of a walk over table.columns with getattr. `row` is for Core
+# result rows (select(*serializer.columns) - no ORM objects, no identity
+# map); `obj` reads the same keys as attributes, from a model instance or
+# from a result row whose columns are in a different order.
+#
+# Dates are left as date objects and rendered by LibriJSONProvider, so the
+# serializers never call strftime.
+
+
+def as_day(value):
+    """Datetime -> date (the JSON is "YYYY-MM-DD"); None stays None."""
+    return value.date() if value is not None else None
+
+
+def as_day_or_na(value):
+    return value.date() if value is not None else "N/A"
+
+
+def _compile(keys, converters, source):
+    namespace = {}
+    items = []
+    for n, key in enumerate(keys):
+        value = source.format(n=n, key=key)
+        if key in converters:
+            namespace[f"_convert{n}"] = converters[key]
+            value = f"_convert{n}({value})"
+        items.append(f"{key!r}: {value}")
+    code = "def serialize(src):\n    return {" + ", ".join(items) + "}\n"
+    exec(code, namespace)
+    return namespace["serialize"]
+
+
+class Serializer:
+    def __init__(self, columns, converters=None):
+        """
+        `columns` are the selected column expressions, in order; each one's
+        key (a label's name for labelled columns) becomes the dict key.
+        `converters` maps a key to a function applied to its value.
+        """
+        converters = converters or {}
+        self.columns = list(columns)
+        self.keys = tuple(column.key for column in self.columns)
+        for key in self.keys:
+            if not key.isidentifier():
+                raise ValueError(f"Cannot compile a serializer for column '{key}'")
+        self.row = _compile(self.keys, converters, "src[{n}]")
+        self.obj = _compile(self.keys, converters, "src.{key}")
+
+    def rows(self, rows):
+        """Serializes the leading columns of each row; extra trailing columns are ignored."""
+        return list(map(self.row, rows))
+
+
+class LibriJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider with dates as ISO 8601 ("2025-01-31", datetimes as
+    "2025-01-31T09:30:00+00:00") instead of HTTP dates. Encodes with orjson
+    when it is installed; indented output (debug/JSONIFY_PRETTYPRINT) and
+    calls with extra json.dumps options go through the stdlib encoder.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Slow-query log. Cursor-execute listeners time every statement, and one
+# that takes longer than SLOW_QUERY_MS is recorded with its normalized SQL,
+# the shapes of its bind parameters (types and lengths, never the values)
+# and the Flask endpoint that ran it. Samples are JSON lines on the
+# "libri.slowlog" logger (a rotating file when SLOW_QUERY_LOG_FILE is set)
+# and the most recent ones are kept for GET /api/admin/slow-queries.
+#
+#   SLOW_QUERY_MS                 threshold in milliseconds (0 = off)
+#   SLOW_QUERY_EXPLAIN            attach the plan of slow SELECTs
+#   SLOW_QUERY_SAMPLE_SECONDS     at most one sample per statement this often
+#   SLOW_QUERY_SAMPLES_PER_MINUTE at most this many samples per process
+#   SLOW_QUERY_LOG_FILE           rotating log file (unset = app log only)
+#
+# Every slow execution is counted, sampled or not. The plan comes from
+# EXPLAIN QUERY PLAN on SQLite and EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL,
+# run on the same connection and transaction as the statement. ANALYZE
+# executes the query a second time, which is why plans are opt-in, limited
+# to SELECTs and subject to the same rate limit as the samples.
+
+RECENT_SAMPLES = 200
+MAX_STATEMENTS = 500  # distinct slow statements tracked per process
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+logger = logging.getLogger("libri.slowlog")
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists: "IN (?, ?, ?)" or "IN (%(id_1_1)s, %(id_1_2)s)"
+_IN_LIST = re.compile(r"IN \((?:\?|%\(\w+\)s)(?:, (?:\?|%\(\w+\)s))*\)", re.IGNORECASE)
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+def normalize_sql(statement):
+    """One line, with bound IN lists collapsed so their sizes group together."""
+    return _IN_LIST.sub("IN (...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _shape(value):
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def _shapes(values):
+    # Runs of the same shape, as IN lists produce, are written once: "int x 40"
+    shapes = [_shape(value) for value in values]
+    out = []
+    for shape in shapes:
+        if out and out[-1][0] == shape:
+            out[-1][1] += 1
+        else:
+            out.append([shape, 1])
+    return [shape if n == 1 else f"{shape} x {n}" for shape, n in out]
+
+
+def parameter_shapes(parameters, executemany=False):
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "first": parameter_shapes(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: _shape(value) for name, value in parameters.items()}
+    return _shapes(parameters or ())
+
+
+def explain(conn, statement, parameters):
+    """The plan of `statement` as a list of lines, on the connection that ran it."""
+    cursor = conn.connection.cursor()
+    try:
+        if conn.dialect.name == "postgresql":
+            # A failing EXPLAIN must not abort the caller's transaction
+            cursor.execute("SAVEPOINT slowlog_explain")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                lines = [row[0] for row in cursor.fetchall()]
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT slowlog_explain")
+                raise
+            finally:
+                cursor.execute("RELEASE SAVEPOINT slowlog_explain")
+            return lines
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.threshold_ms = 0
+        self.explain = False
+        self.sample_seconds = 60.0
+        self.per_minute = 30
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.statements = {}
+            self.samples = deque(maxlen=RECENT_SAMPLES)
+            self.tokens = float(self.per_minute)
+            self.refilled = time.monotonic()
+            self.dropped = 0
+
+    def init_app(self, app):
+        # Settings are per process, like the listeners; the last app wins
+        self.threshold_ms = app.config["SLOW_QUERY_MS"]
+        self.explain = app.config["SLOW_QUERY_EXPLAIN"]
+        self.sample_seconds = app.config["SLOW_QUERY_SAMPLE_SECONDS"]
+        self.per_minute = app.config["SLOW_QUERY_SAMPLES_PER_MINUTE"]
+        self.tokens = min(self.tokens, float(self.per_minute))
+        if app.config["SLOW_QUERY_LOG_FILE"]:
+            _log_to_file(app.config["SLOW_QUERY_LOG_FILE"])
+        if self.threshold_ms:
+            _listen_for_queries()
+
+    def _take_sample(self, entry, now):
+        # Per statement: once per sample_seconds. Overall: a token bucket
+        # refilled at per_minute tokens a minute.
+        if now - entry["last_sampled"] < self.sample_seconds:
+            return False
+        self.tokens = min(
+            float(self.per_minute),
+            self.tokens + (now - self.refilled) * self.per_minute / 60,
+        )
+        self.refilled = now
+        if self.tokens < 1:
+            self.dropped += 1
+            return False
+        self.tokens -= 1
+        entry["last_sampled"] = now
+        entry["sampled"] += 1
+        return True
+
+    def observe(self, conn, statement, parameters, executemany, elapsed_ms):
+        sql = normalize_sql(statement)
+        fingerprint = hashlib.sha1(sql.encode()).hexdigest()[:12]
+        endpoint = request.endpoint if has_request_context() else None
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.statements.get(fingerprint)
+            if entry is None:
+                if len(self.statements) >= MAX_STATEMENTS:
+                    self.dropped += 1
+                    return
+                entry = self.statements[fingerprint] = {
+                    "sql": sql,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "sampled": 0,
+                    "last_sampled": float("-inf"),
+                    "last_endpoint": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["last_endpoint"] = endpoint
+            if not self._take_sample(entry, now):
+                return
+
+        sample = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "fingerprint": fingerprint,
+            "duration_ms": round(elapsed_ms, 3),
+            "endpoint": endpoint,
+            "method": request.method if has_request_context() else None,
+            "sql": sql,
+            "params": parameter_shapes(parameters, executemany),
+        }
+        if self.explain and not executemany and _EXPLAINABLE.match(statement):
+            try:
+                sample["plan"] = explain(conn, statement, parameters)
+            except Exception as e:
+                sample["plan_error"] = f"{type(e).__name__}: {e}"
+
+        with self.lock:
+            self.samples.append(sample)
+        logger.warning(json.dumps(sample))
+
+    def report(self):
+        with self.lock:
+            statements = sorted(
+                (
+                    {
+                        "fingerprint": fingerprint,
+                        "sql": entry["sql"],
+                        "count": entry["count"],
+                        "total_ms": round(entry["total_ms"], 3),
+                        "avg_ms": round(entry["total_ms"] / entry["count"], 3),
+                        "max_ms": round(entry["max_ms"], 3),
+                        "sampled": entry["sampled"],
+                        "last_endpoint": entry["last_endpoint"],
+                    }
+                    for fingerprint, entry in self.statements.items()
+                ),
+                key=lambda s: s["total_ms"],
+                reverse=True,
+            )
+            return {
+                "threshold_ms": self.threshold_ms,
+                "explain": self.explain,
+                "dropped": self.dropped,
+                "statements": statements,
+                "samples": list(reversed(self.samples)),
+            }
+
+
+def _log_to_file(path):
+    if any(getattr(h, "baseFilename", None) == path for h in logger.handlers):
+        return
+    handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False  # the file has them; keep JSON out of the app log
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slowlog_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_slowlog_started", None)
+    if started is None or not slow_queries.threshold_ms:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= slow_queries.threshold_ms:
+        slow_queries.observe(conn, statement, parameters, executemany, elapsed_ms)
+
+
+def _listen_for_queries():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+slow_queries = SlowQueryLog()
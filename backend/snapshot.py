@@ -0,0 +1,120 @@
+import os
+import glob
+import gzip
+import logging
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip and identity still work
+    brotli = None
+
+# Precompressed snapshots of the full catalog (/api/books?all=1).
+# One worker writes catalog-v<version>.json plus .gz/.br variants whenever it
+# sees a catalog version with no snapshot; every worker then serves the files
+# with send_file, which uses the server's sendfile() wrapper when available.
+# The bytes live in the shared OS page cache instead of each worker's heap,
+# and compression happens once per version instead of once per response.
+
+ENCODINGS = {
+    "br": ".br",
+    "gzip": ".gz",
+    "identity": "",
+}
+
+# A builder that dies mid-way must not block snapshots forever
+STALE_LOCK_SECONDS = 60
+
+logger = logging.getLogger("libri.snapshot")
+_warned_no_brotli = False
+
+
+class CatalogSnapshots:
+    def __init__(self, directory, gzip_level=6, brotli_quality=5):
+        self.directory = directory
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        os.makedirs(directory, exist_ok=True)
+        global _warned_no_brotli
+        if brotli is None and not _warned_no_brotli:
+            _warned_no_brotli = True
+            logger.warning(
+                "brotli is not installed; catalog snapshots are served as gzip "
+                "or identity only (pip install Brotli to enable br)"
+            )
+
+    def path_for(self, version, encoding="identity"):
+        return os.path.join(
+            self.directory, f"catalog-v{version}.json{ENCODINGS[encoding]}"
+        )
+
+    def available_encodings(self):
+        return [e for e in ENCODINGS if e != "br" or brotli is not None]
+
+    def negotiate(self, accept_encodings):
+        """Picks the best stored encoding for a request's Accept-Encoding."""
+        for encoding in ("br", "gzip"):
+            if encoding in self.available_encodings() and accept_encodings[encoding]:
+                return encoding
+        return "identity"
+
+    def has(self, version):
+        # The identity file is written last, so it marks a complete snapshot
+        return os.path.exists(self.path_for(version))
+
+    def ensure(self, version, render):
+        """
+        Returns True when a snapshot for `version` is ready to serve.
+        `render` produces the JSON bytes and is only called by the one process
+        that wins the build lock; the others fall back until the files appear.
+        """
+        if self.has(version):
+            return True
+
+        lock_path = os.path.join(self.directory, "build.lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return False
+
+        try:
+            os.close(fd)
+            if not self.has(version):
+                self.build(version, render())
+            return True
+        finally:
+            os.remove(lock_path)
+
+    def build(self, version, body):
+        variants = {"gzip": gzip.compress(body, compresslevel=self.gzip_level)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=self.brotli_quality)
+        variants["identity"] = body
+
+        for encoding, data in variants.items():
+            path = self.path_for(version, encoding)
+            tmp_path = f"{path}.tmp{os.getpid()}"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        self.prune(keep=version)
+
+    def prune(self, keep):
+        # Keep the previous version too: another worker may be mid-response
+        for path in glob.glob(os.path.join(self.directory, "catalog-v*.json*")):
+            name = os.path.basename(path)
+            try:
+                version = int(name[len("catalog-v"):].split(".", 1)[0])
+            except ValueError:
+                continue
+            if version < keep - 1:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
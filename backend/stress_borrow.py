@@ -0,0 +1,118 @@
+import argparse
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import func
+
+# Concurrency stress test for borrow/return.
+# Fires many simultaneous borrows of one popular title from many members
+# (plus some parallel returns) and checks the invariants afterwards:
+#   - no more successful borrows than copies on the shelf
+#   - availableCopies never goes negative
+#   - availableCopies + active loans == copies
+# Run against a scratch database, e.g.
+#   SQLALCHEMY_DATABASE_URI=sqlite:///stress.db python stress_borrow.py
+# Exits non-zero when an invariant is violated.
+
+
+def run(app, copies, members, rounds, threads):
+    from auth import issue_access_token
+    from models import db, User, Book, BorrowRecord
+
+    with app.app_context():
+        book = Book(title="Stress Test Title", copies=copies, availableCopies=copies)
+        db.session.add(book)
+        users = [
+            User(
+                full_name=f"Stress Member {i}",
+                email=f"stress-{datetime.now(timezone.utc).timestamp()}-{i}@example.com",
+                password_hash="!",
+                is_verified=True,
+            )
+            for i in range(members)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        book_id = book.id
+        members = [(u.id, issue_access_token(u)) for u in users]
+
+    outcomes = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def active_record(user_id):
+        with app.app_context():
+            return db.session.scalar(
+                db.select(BorrowRecord.id).where(
+                    BorrowRecord.book_id == book_id,
+                    BorrowRecord.user_id == user_id,
+                    BorrowRecord.status == "borrowed",
+                )
+            )
+
+    def worker(worker_no):
+        client = app.test_client()
+        start.wait()
+        for i in range(rounds):
+            user_id, token = members[(worker_no * rounds + i) % len(members)]
+            headers = {"Authorization": f"Bearer {token}"}
+            r = client.post(f"/api/borrow/{book_id}", headers=headers, json={})
+            with lock:
+                outcomes[f"borrow {r.status_code}"] += 1
+            if r.status_code == 200 and i % 2:
+                # Give some copies back while others are still borrowing
+                record_id = active_record(user_id)
+                r = client.post(f"/api/return/{record_id}", headers=headers)
+                with lock:
+                    outcomes[f"return {r.status_code}"] += 1
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    with app.app_context():
+        book = db.session.get(Book, book_id)
+        active = db.session.scalar(
+            db.select(func.count())
+            .select_from(BorrowRecord)
+            .where(BorrowRecord.book_id == book_id, BorrowRecord.status == "borrowed")
+        )
+        available, total = book.availableCopies, book.copies
+
+    print(f"Responses: {dict(outcomes)}")
+    print(f"copies={total} available={available} active_loans={active}")
+
+    ok = True
+    if available < 0:
+        print("❌ availableCopies went negative")
+        ok = False
+    if available + active != total:
+        print("❌ availableCopies + active loans != copies (lost update)")
+        ok = False
+    if active > total:
+        print("❌ more active loans than copies (oversold)")
+        ok = False
+    if ok:
+        print("✅ No overselling, stock is consistent.")
+    return ok
+
+
+if __name__ == "__main__":
+    from app import create_app, init_database
+
+    parser = argparse.ArgumentParser(description="Concurrent borrow stress test.")
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        init_database()  # scratch databases start empty
+
+    if not run(app, args.copies, args.members, args.rounds, args.threads):
+        sys.exit(1)
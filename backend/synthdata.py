@@ -0,0 +1,364 @@
+import argparse
+import csv
+import io
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select, text, update
+from werkzeug.security import generate_password_hash
+from models import db, Book, BorrowRecord, User
+from circulation import LOAN_PERIOD, MAX_ACTIVE_BORROWS, reconcile_counters
+from search import rebuild_search_index
+from catalog_cache import bump_catalog_version
+
+# Synthetic library for load testing: users, books and loans in the shapes
+# production sees, at sizes the real catalog export (about 5k books, no
+# members, no loans) can't reach.
+#
+#   python synthdata.py --users 20000 --books 100000 --loans 2000000
+#
+# - Book popularity is Zipf-like and member activity heavy-tailed, so a few
+#   titles and members account for most loans.
+# - Loans are spread over --days of history, weighted toward recent weeks.
+#   Old ones are returned (some late); recent ones may still be out, and
+#   those older than the loan period are overdue. About 15% were renewed.
+# - Loans still out respect the live rules: copies on the shelf, at most
+#   MAX_ACTIVE_BORROWS per member, one active loan per member and title.
+#   availableCopies, user_circulation, the search index and the catalog
+#   version are brought in line afterwards.
+#
+# Every member's password is SYNTH_PASSWORD; synth-admin@example.com is a
+# verified admin. Loads into an empty database only (reset-db first), in
+# batches of --batch-size (COPY on PostgreSQL). --seed makes runs repeatable.
+
+SYNTH_PASSWORD = "synthetic"
+ADMIN_EMAIL = "synth-admin@example.com"
+
+FIRST_NAMES = (
+    "Ada Alan Amara Ben Chen Clara Dario Elena Emeka Fatima Grace Hana Ivan "
+    "Jonas Kai Leila Lucas Maya Mei Nadia Noah Omar Priya Quinn Rosa Sam "
+    "Sofia Tariq Uma Victor Wen Yara Zoe"
+).split()
+LAST_NAMES = (
+    "Abe Baker Castro Diaz Eriksen Fischer Garcia Haddad Ito Jensen Kim Li "
+    "Lopez Mensah Moreau Nakamura Novak Okafor Patel Rossi Santos Schmidt "
+    "Singh Tanaka Usman Vargas Wang Weber Yilmaz Zhang"
+).split()
+TITLE_ADJECTIVES = (
+    "Silent Hidden Broken Golden Lost Secret Quiet Burning Distant Forgotten "
+    "Little Wild Endless Crimson Hollow Bright Northern Last Winter Paper"
+).split()
+TITLE_NOUNS = (
+    "River Garden House Kingdom Letter Voyage Mountain Island Archive City "
+    "Harbor Forest Promise Machine Library Storm Mirror Orchard Bridge Star"
+).split()
+SUMMARY_WORDS = (
+    "journey family memory war love city village secret history science "
+    "friendship courage mystery discovery faith winter summer ocean empire "
+    "music truth letters stranger home future past dream island children"
+).split()
+PUBLISHERS = (
+    "Penguin Random House",
+    "HarperCollins",
+    "Macmillan",
+    "Hachette",
+    "Simon & Schuster",
+    "Scholastic",
+    "Oxford University Press",
+    "Living Stream Ministry",
+)
+GENRES = {
+    "Fiction": 22,
+    "Mystery": 10,
+    "Science Fiction": 7,
+    "Fantasy": 8,
+    "Biography": 6,
+    "History": 8,
+    "Children": 12,
+    "Poetry": 3,
+    "Religion": 9,
+    "Science": 6,
+    "Self-Help": 4,
+    "Romance": 5,
+}
+LANGUAGES = {"English": 78, "Spanish": 7, "Chinese": 5, "French": 4, "German": 3, "Korean": 3}
+COPIES = {1: 50, 2: 25, 3: 14, 5: 8, 10: 3}
+
+# Loans borrowed within this window may still be out; older ones are returned
+OPEN_WINDOW = LOAN_PERIOD * 2
+STILL_OUT_SHARE = 0.35
+RENEWED_SHARE = 0.15
+# Typical time to return, in days (log-normal around two weeks)
+RETURN_DAYS_MU = math.log(14)
+RETURN_DAYS_SIGMA = 0.6
+
+
+def weighted(rng, table):
+    return rng.choices(list(table), weights=list(table.values()))[0]
+
+
+def _copy_rows(table, columns, rows):
+    """PostgreSQL fast path: stream the rows through COPY ... FROM STDIN."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buf.seek(0)
+
+    quoted = ", ".join(f'"{c}"' for c in columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{table.name}" ({quoted}) FROM STDIN WITH (FORMAT csv)', buf)
+    finally:
+        cursor.close()
+
+
+def insert_rows(model, rows):
+    if not rows:
+        return
+    if db.engine.dialect.name == "postgresql":
+        _copy_rows(model.__table__, list(rows[0]), rows)
+    else:
+        db.session.execute(insert(model.__table__), rows)
+    db.session.commit()
+
+
+def load_in_batches(model, rows, batch_size, log):
+    """Inserts an iterable of row dicts; returns (rows, seconds)."""
+    started = time.perf_counter()
+    batch, count = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            insert_rows(model, batch)
+            count += len(batch)
+            batch = []
+            if count % (batch_size * 20) == 0:
+                log(f"  {model.__tablename__}: {count:,} rows")
+    insert_rows(model, batch)
+    count += len(batch)
+    return count, time.perf_counter() - started
+
+
+def book_rows(rng, count, now):
+    for n in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        genre = weighted(rng, GENRES)
+        noun = rng.choice(TITLE_NOUNS)
+        if rng.random() < 0.5:
+            title = f"The {rng.choice(TITLE_ADJECTIVES)} {noun}"
+        else:
+            title = f"{noun} of the {rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)}"
+        words = rng.sample(SUMMARY_WORDS, 6)
+        copies = weighted(rng, COPIES)
+        price = round(rng.uniform(4.99, 59.99), 2)
+        year = 2025 - min(int(rng.expovariate(1 / 15)), 75)
+        yield {
+            "title": title,
+            "author": f"{first} {last}",
+            "authorLastFirst": f"{last}, {first}",
+            "publisher": rng.choice(PUBLISHERS),
+            "yearPublished": year,
+            "datePublished": str(year),
+            "genre": genre,
+            "category": genre,
+            "summary": (
+                f"A story of {words[0]} and {words[1]}, where {words[2]} meets "
+                f"{words[3]}. Readers follow the {words[4]} of a {words[5]} "
+                f"across {rng.randint(2, 40)} years."
+            ),
+            "tags": ", ".join(rng.sample(SUMMARY_WORDS, 3)),
+            "language": weighted(rng, LANGUAGES),
+            "isbn": f"978{rng.randrange(10**10):010d}",
+            "numberOfPages": rng.randint(40, 900),
+            "format": rng.choice(("Paperback", "Hardcover", "Ebook", "Audiobook")),
+            "rating": round(rng.uniform(2.5, 5.0), 1),
+            "listPrice": f"{int(price)} $",
+            "listPriceUsd": price,
+            "copies": copies,
+            "availableCopies": copies,  # loans still out are subtracted later
+            "uploadedImageUrl": f"https://covers.example.com/synthetic/{n}.jpg",
+            "dateAdded": (now - timedelta(days=rng.randint(0, 3650))).strftime("%Y-%m-%d"),
+        }
+
+
+def user_rows(rng, count, now, password_hash):
+    yield {
+        "full_name": "Synthetic Admin",
+        "email": ADMIN_EMAIL,
+        "password_hash": password_hash,
+        "role": "admin",
+        "is_verified": True,
+        "registration_date": now - timedelta(days=3650),
+    }
+    for n in range(1, count + 1):
+        yield {
+            "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"synth-{n}@example.com",
+            "password_hash": password_hash,
+            "role": "user",
+            "is_verified": rng.random() < 0.97,
+            "registration_date": now - timedelta(days=rng.randint(0, 3650)),
+        }
+
+
+def cumulative(weights):
+    total, out = 0.0, []
+    for weight in weights:
+        total += weight
+        out.append(total)
+    return out
+
+
+def loan_rows(rng, count, now, days, books, users, batch_size, stats):
+    """
+    Yields `count` loans. `books` is [(id, copies)], `users` a list of ids.
+    Fills `stats` with the active / overdue / renewed / late counts.
+    """
+    book_ids = [book_id for book_id, _ in books]
+    copies = dict(books)
+    rng.shuffle(book_ids)  # popularity rank independent of id
+    book_weights = cumulative(1 / (rank + 1) ** 0.9 for rank in range(len(book_ids)))
+    user_weights = cumulative(rng.paretovariate(1.5) for _ in users)
+
+    out_by_book, out_by_user, out_pairs = Counter(), Counter(), set()
+    window = days * 86400
+
+    remaining = count
+    while remaining:
+        n = min(batch_size, remaining)
+        remaining -= n
+        picked_books = rng.choices(book_ids, cum_weights=book_weights, k=n)
+        picked_users = rng.choices(users, cum_weights=user_weights, k=n)
+        for book_id, user_id in zip(picked_books, picked_users):
+            # Skewed toward recent activity
+            borrow_date = now - timedelta(seconds=window * rng.random() ** 1.6)
+            renewed = rng.random() < RENEWED_SHARE
+            due_date = borrow_date + LOAN_PERIOD * (2 if renewed else 1)
+
+            still_out = (
+                now - borrow_date < OPEN_WINDOW
+                and rng.random() < STILL_OUT_SHARE
+                and out_by_book[book_id] < copies[book_id]
+                and out_by_user[user_id] < MAX_ACTIVE_BORROWS
+                and (user_id, book_id) not in out_pairs
+            )
+            if still_out:
+                out_by_book[book_id] += 1
+                out_by_user[user_id] += 1
+                out_pairs.add((user_id, book_id))
+                stats["active"] += 1
+                stats["overdue"] += due_date < now
+                return_date = None
+            else:
+                kept = timedelta(days=rng.lognormvariate(RETURN_DAYS_MU, RETURN_DAYS_SIGMA))
+                return_date = min(borrow_date + kept, now)
+                stats["late"] += return_date > due_date
+            stats["renewed"] += renewed
+
+            yield {
+                "user_id": user_id,
+                "book_id": book_id,
+                "borrow_date": borrow_date,
+                "due_date": due_date,
+                "return_date": return_date,
+                "status": "returned" if return_date else "borrowed",
+                "renewed": renewed,
+            }
+
+
+def sync_available_copies():
+    """availableCopies = copies - loans still out, in one statement."""
+    out = (
+        select(func.count())
+        .where(BorrowRecord.book_id == Book.id, BorrowRecord.status == "borrowed")
+        .scalar_subquery()
+    )
+    db.session.execute(update(Book).values(availableCopies=Book.copies - out))
+
+
+def generate(users, books, loans, days=730, seed=None, batch_size=5000, log=print):
+    """
+    Loads the synthetic dataset into the (empty) database of the current app.
+    Returns a report dict with row counts, timings and loan state counts.
+    """
+    for model in (User, Book, BorrowRecord):
+        if db.session.scalar(select(func.count()).select_from(model)):
+            raise SystemExit(
+                f"{model.__tablename__} is not empty; run `flask --app app reset-db` first."
+            )
+
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    report = {"seed": seed, "days": days}
+    started = time.perf_counter()
+
+    log(f"Loading {users:,} users, {books:,} books, {loans:,} loans...")
+    password_hash = generate_password_hash(SYNTH_PASSWORD)
+    report["users"], report["users_seconds"] = load_in_batches(
+        User, user_rows(rng, users, now, password_hash), batch_size, log
+    )
+    report["books"], report["books_seconds"] = load_in_batches(
+        Book, book_rows(rng, books, now), batch_size, log
+    )
+
+    book_copies = db.session.execute(select(Book.id, Book.copies)).all()
+    member_ids = db.session.scalars(
+        select(User.id).where(User.role == "user", User.is_verified.is_(True))
+    ).all()
+    loan_stats = Counter()
+    if loans and book_copies and member_ids:
+        report["loans"], report["loans_seconds"] = load_in_batches(
+            BorrowRecord,
+            loan_rows(rng, loans, now, days, book_copies, member_ids, batch_size, loan_stats),
+            batch_size,
+            log,
+        )
+    report.update({key: loan_stats[key] for key in ("active", "overdue", "renewed", "late")})
+
+    log("Syncing copies, counters, search index and planner statistics...")
+    sync_available_copies()
+    bump_catalog_version()
+    rebuild_search_index()
+    db.session.commit()
+    reconcile_counters()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    for key in ("users_seconds", "books_seconds", "loans_seconds"):
+        if key in report:
+            report[key] = round(report[key], 3)
+    log(
+        f"✅ {report['users']:,} users, {report['books']:,} books, "
+        f"{report.get('loans', 0):,} loans ({report['active']:,} out, "
+        f"{report['overdue']:,} overdue) in {report['seconds']}s"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    from app import create_app, init_database
+
+    parser = argparse.ArgumentParser(description="Load a synthetic library for load tests.")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--loans", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=730, help="days of loan history")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        init_database()  # no-op unless the database is new
+        generate(
+            args.users,
+            args.books,
+            args.loans,
+            days=args.days,
+            seed=args.seed,
+            batch_size=args.batch_size,
+        )
@@ -0,0 +1,18 @@
+from app import create_app, start_outbox_workers, start_scheduler
+
+# WSGI entry point, e.g.
+#   gunicorn --workers 4 --threads 8 wsgi:app
+# Run `flask --app app init-db` once per deploy before starting workers;
+# the workers themselves never touch the schema.
+# Every worker drains the mail outbox with MAIL_OUTBOX_WORKERS sender
+# threads (set it to 0 and run `python mail_outbox.py` to send elsewhere).
+# With RUN_JOBS=1 every worker also runs the scheduler; the job leases keep
+# each job to one run per interval. Don't combine either with --preload,
+# which would start their threads before the workers fork.
+app = create_app()
+# Fork the password hashing processes while this worker is still single-
+# threaded; forking later, from a request, could copy a held lock
+app.extensions["libri"].password_hasher.start()
+start_outbox_workers(app)
+if app.config["RUN_JOBS"]:
+    start_scheduler(app)
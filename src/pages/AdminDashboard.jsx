@@ -43,6 +43,20 @@ export default function AdminDashboard() {
   });
 
   const [contactMessages, setContactMessages] = useState([]);
+  const [summary, setSummary] = useState(null);
+
+  // Overview numbers are aggregated server-side in one request
+  const fetchSummary = async () => {
+    const token = localStorage.getItem("token");
+    try {
+      const response = await fetch("http://localhost:5000/api/admin/summary", {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (response.ok) setSummary(await response.json());
+    } catch (err) {
+      console.error("Error fetching summary:", err);
+    }
+  };
 
   const fetchMessages = async () => {
     const token = localStorage.getItem("token");
@@ -63,6 +77,7 @@ export default function AdminDashboard() {
   // Call this inside your existing useEffect when the tab changes
   useEffect(() => {
     if (activeTab === "messages") fetchMessages();
+    if (activeTab === "overview") fetchSummary();
   }, [activeTab]);
 
   // --- FIELD DEFINITIONS ---
@@ -132,22 +147,70 @@ export default function AdminDashboard() {
     }
   };
 
-  const fetchBorrowRecords = async () => {
+  const [recordsCursor, setRecordsCursor] = useState(null);
+  const [debouncedBorrowSearch, setDebouncedBorrowSearch] = useState("");
+
+  // Filtering and paging happen server-side; wait for typing to settle
+  useEffect(() => {
+    const timer = setTimeout(
+      () => setDebouncedBorrowSearch(borrowSearch.trim()),
+      250,
+    );
+    return () => clearTimeout(timer);
+  }, [borrowSearch]);
+
+  const buildRecordsParams = (cursor) => {
+    const params = new URLSearchParams({ sort: "newest", limit: 50 });
+    if (statusFilter !== "all") params.set("status", statusFilter);
+    if (debouncedBorrowSearch) params.set("q", debouncedBorrowSearch);
+    if (cursor) params.set("cursor", cursor);
+    return params;
+  };
+
+  const fetchBorrowRecords = async (cursor = null) => {
     const token = localStorage.getItem("token");
     try {
       const response = await fetch(
-        "http://localhost:5000/api/admin/borrow-records",
+        `http://localhost:5000/api/admin/borrow-records?${buildRecordsParams(cursor).toString()}`,
         {
           headers: { Authorization: `Bearer ${token}` },
         },
       );
       const data = await response.json();
-      setBorrowRecords(data);
+      const items = Array.isArray(data.items) ? data.items : [];
+      setBorrowRecords((prev) => (cursor ? [...prev, ...items] : items));
+      setRecordsCursor(data.next_cursor || null);
     } catch (err) {
       console.error("Error fetching borrow records:", err);
     }
   };
 
+  useEffect(() => {
+    fetchBorrowRecords();
+  }, [statusFilter, debouncedBorrowSearch]);
+
+  const handleExportRecords = async (format) => {
+    const token = localStorage.getItem("token");
+    const params = buildRecordsParams(null);
+    params.delete("limit");
+    params.set("format", format);
+    try {
+      const response = await fetch(
+        `http://localhost:5000/api/admin/borrow-records/export?${params.toString()}`,
+        { headers: { Authorization: `Bearer ${token}` } },
+      );
+      if (!response.ok) return alert("Export failed.");
+      const url = URL.createObjectURL(await response.blob());
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = `borrow-records.${format}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      console.error("Error exporting borrow records:", err);
+    }
+  };
+
   // --- HANDLERS ---
   const handleAddBookSubmit = async (e) => {
     e.preventDefault();
@@ -196,7 +259,6 @@ export default function AdminDashboard() {
   useEffect(() => {
     fetchAdminProfile();
     fetchSystemData();
-    fetchBorrowRecords(); // Add this
   }, []);
 
   const fetchSystemData = async () => {
@@ -206,7 +268,7 @@ export default function AdminDashboard() {
         headers: { Authorization: `Bearer ${token}` },
       });
       const userData = await userRes.json();
-      const bookRes = await fetch("http://localhost:5000/api/books");
+      const bookRes = await fetch("http://localhost:5000/api/books?all=1");
       const bookData = await bookRes.json();
       setUsers(Array.isArray(userData) ? userData : []);
       setBooks(Array.isArray(bookData) ? bookData : []);
@@ -286,7 +348,10 @@ export default function AdminDashboard() {
         `http://localhost:5000/api/books/${editFormData.id}`,
         {
           method: "PUT",
-          headers: { "Content-Type": "application/json" },
+          headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("token")}`,
+          },
           body: JSON.stringify(dataToSend),
         },
       );
@@ -317,7 +382,10 @@ export default function AdminDashboard() {
     try {
       const response = await fetch(
         `http://localhost:5000/api/debug/delete-user?email=${email}`,
-        { method: "DELETE" },
+        {
+          method: "DELETE",
+          headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+        },
       );
       if (response.ok) fetchSystemData();
     } catch (err) {
@@ -382,15 +450,8 @@ export default function AdminDashboard() {
       b.author?.toLowerCase().includes(searchQuery.toLowerCase()),
   );
 
-  const filteredBorrowRecords = borrowRecords.filter((record) => {
-    const matchesStatus =
-      statusFilter === "all" || record.status === statusFilter;
-    const matchesSearch =
-      record.user_name.toLowerCase().includes(borrowSearch.toLowerCase()) ||
-      record.book_title.toLowerCase().includes(borrowSearch.toLowerCase());
-
-    return matchesStatus && matchesSearch;
-  });
+  // Already filtered by the server (status and search)
+  const filteredBorrowRecords = borrowRecords;
 
   const filteredInventory = books.filter((book) => {
     const matchesSearch =
@@ -610,7 +671,7 @@ export default function AdminDashboard() {
                 Total Members
               </h3>
               <p className='text-4xl font-black text-slate-800'>
-                {users.length}
+                {summary ? summary.users.total : users.length}
               </p>
             </div>
             <div className='bg-white p-8 rounded-[2.5rem] border border-slate-100 shadow-sm'>
@@ -621,9 +682,46 @@ export default function AdminDashboard() {
                 Books in Catalog
               </h3>
               <p className='text-4xl font-black text-slate-800'>
-                {books.length}
+                {summary ? summary.catalog.titles : books.length}
+              </p>
+            </div>
+            <div className='bg-white p-8 rounded-[2.5rem] border border-slate-100 shadow-sm'>
+              <div className='w-12 h-12 bg-emerald-50 rounded-2xl flex items-center justify-center text-2xl mb-6'>
+                📦
+              </div>
+              <h3 className='text-slate-400 font-black text-[10px] uppercase mb-1'>
+                Copies Out
+              </h3>
+              <p className='text-4xl font-black text-slate-800'>
+                {summary ? `${summary.catalog.copies_out} / ${summary.catalog.copies}` : "—"}
               </p>
             </div>
+            <div className='bg-white p-8 rounded-[2.5rem] border border-slate-100 shadow-sm'>
+              <div className='w-12 h-12 bg-amber-50 rounded-2xl flex items-center justify-center text-2xl mb-6'>
+                ⏰
+              </div>
+              <h3 className='text-slate-400 font-black text-[10px] uppercase mb-1'>
+                Overdue Loans
+              </h3>
+              <p className='text-4xl font-black text-slate-800'>
+                {summary ? summary.catalog.overdue_loans : "—"}
+              </p>
+            </div>
+            {summary && summary.top_titles.length > 0 && (
+              <div className='md:col-span-2 bg-white p-8 rounded-[2.5rem] border border-slate-100 shadow-sm'>
+                <h3 className='text-slate-400 font-black text-[10px] uppercase mb-4'>
+                  Most Borrowed Titles
+                </h3>
+                <ol className='space-y-2'>
+                  {summary.top_titles.map((t) => (
+                    <li key={t.id} className='flex justify-between text-sm font-bold text-slate-700'>
+                      <span>{t.title}</span>
+                      <span className='text-slate-400'>{t.loans}</span>
+                    </li>
+                  ))}
+                </ol>
+              </div>
+            )}
           </div>
         )}
 
@@ -923,7 +1021,8 @@ export default function AdminDashboard() {
             <div className='flex flex-col lg:flex-row justify-between items-start lg:items-center gap-6 mb-10'>
               <div>
                 <p className='text-[10px] text-slate-400 font-bold uppercase mt-2'>
-                  Monitoring {filteredBorrowRecords.length} Records
+                  Monitoring {filteredBorrowRecords.length}
+                  {recordsCursor ? "+" : ""} Records
                 </p>
               </div>
 
@@ -958,6 +1057,19 @@ export default function AdminDashboard() {
                     </button>
                   ))}
                 </div>
+
+                {/* Export (same filters, streamed by the server) */}
+                <div className='flex gap-2'>
+                  {["csv", "ndjson"].map((f) => (
+                    <button
+                      key={f}
+                      onClick={() => handleExportRecords(f)}
+                      className='px-4 py-2 rounded-lg text-[9px] font-black uppercase bg-slate-900 text-white hover:bg-indigo-600 transition-all'
+                    >
+                      Export {f}
+                    </button>
+                  ))}
+                </div>
               </div>
             </div>
 
@@ -1080,6 +1192,17 @@ export default function AdminDashboard() {
                 </p>
               </div>
             )}
+
+            {recordsCursor && (
+              <div className='pt-8 text-center'>
+                <button
+                  onClick={() => fetchBorrowRecords(recordsCursor)}
+                  className='px-6 py-2.5 rounded-xl text-[10px] font-black uppercase bg-slate-100 text-slate-600 hover:bg-slate-200 transition-all'
+                >
+                  Load More
+                </button>
+              </div>
+            )}
           </section>
         )}
 
@@ -3,28 +3,104 @@ import { useNavigate } from "react-router-dom"; // Add this to your imports
 
 const ITEMS_PER_PAGE = 20;
 
+// Only what the grid cards render; the modal loads the full record
+const CARD_FIELDS = [
+  "title",
+  "author",
+  "language",
+  "copies",
+  "availableCopies",
+  "listPriceUsd",
+  "uploadedImageUrl",
+].join(",");
+
 export default function Home() {
   const navigate = useNavigate(); // Initialize the redirect tool
   const [bookData, setBookData] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState("");
-  const [currentPage, setCurrentPage] = useState(1);
   const [selectedLang, setSelectedLang] = useState("All");
   const [showOnlyInStock, setShowOnlyInStock] = useState(false);
   const [selectedBook, setSelectedBook] = useState(null);
 
+  const [languageOptions, setLanguageOptions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [debouncedSearch, setDebouncedSearch] = useState("");
+
+  // Wait for the user to stop typing before hitting the search endpoint
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 250);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Filtering, search and paging happen on the server; we only hold the loaded pages
+  const buildBooksUrl = (cursor) => {
+    const params = new URLSearchParams({
+      limit: ITEMS_PER_PAGE,
+      fields: CARD_FIELDS,
+    });
+    if (selectedLang !== "All") params.set("language", selectedLang);
+    if (showOnlyInStock) params.set("in_stock", "1");
+    if (cursor) params.set("cursor", cursor);
+    if (debouncedSearch) {
+      params.set("q", debouncedSearch);
+      return `http://localhost:5000/api/books/search?${params.toString()}`;
+    }
+    params.set("sort", "title");
+    return `http://localhost:5000/api/books?${params.toString()}`;
+  };
+
   useEffect(() => {
-    fetch("http://localhost:5000/api/books")
+    fetch("http://localhost:5000/api/books/languages")
+      .then((res) => res.json())
+      .then((data) => setLanguageOptions(Array.isArray(data) ? data : []))
+      .catch((err) => console.error("Error loading languages:", err));
+  }, []);
+
+  useEffect(() => {
+    fetch(buildBooksUrl(null))
       .then((res) => res.json())
       .then((data) => {
-        setBookData(Array.isArray(data) ? data : []);
+        setBookData(Array.isArray(data.items) ? data.items : []);
+        setNextCursor(data.next_cursor || null);
         setLoading(false);
       })
       .catch((err) => {
         console.error("Error connecting to database:", err);
         setLoading(false);
       });
-  }, []);
+  }, [selectedLang, showOnlyInStock, debouncedSearch]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(buildBooksUrl(nextCursor));
+      const data = await res.json();
+      setBookData((prev) => [...prev, ...(data.items || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      console.error("Error loading more books:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const openBook = async (book) => {
+    setSelectedBook(book);
+    try {
+      const res = await fetch(`http://localhost:5000/api/books/${book.id}`);
+      if (!res.ok) return;
+      const full = await res.json();
+      // Keep any stock change made while the request was in flight
+      setSelectedBook((prev) =>
+        prev && prev.id === book.id ? { ...full, ...prev } : prev,
+      );
+    } catch (err) {
+      console.error("Error loading book details:", err);
+    }
+  };
 
   const handleBorrow = async (bookId) => {
     // 1. Check if user is logged in
@@ -90,33 +166,11 @@ export default function Home() {
   };
 
   const languages = useMemo(
-    () =>
-      [
-        "All",
-        ...new Set(bookData.map((book) => book.language || "Unknown")),
-      ].sort(),
-    [bookData],
+    () => ["All", ...languageOptions],
+    [languageOptions],
   );
 
-  const filteredBooks = useMemo(() => {
-    return bookData.filter((book) => {
-      const search = searchTerm.toLowerCase();
-      const matchesSearch =
-        book.title?.toLowerCase().includes(search) ||
-        book.author?.toLowerCase().includes(search);
-      const matchesLang =
-        selectedLang === "All" || book.language === selectedLang;
-      const matchesStock = showOnlyInStock ? (book.copies || 0) > 0 : true;
-      return matchesSearch && matchesLang && matchesStock;
-    });
-  }, [searchTerm, selectedLang, showOnlyInStock, bookData]);
-
-  const totalPages = Math.ceil(filteredBooks.length / ITEMS_PER_PAGE) || 1;
-  const startIndex = (currentPage - 1) * ITEMS_PER_PAGE;
-  const currentBooks = filteredBooks.slice(
-    startIndex,
-    startIndex + ITEMS_PER_PAGE,
-  );
+  const currentBooks = bookData;
 
   if (loading) {
     return (
@@ -144,7 +198,6 @@ export default function Home() {
             value={selectedLang}
             onChange={(e) => {
               setSelectedLang(e.target.value);
-              setCurrentPage(1);
             }}
             className='appearance-none bg-slate-50 border-2 border-transparent focus:border-indigo-600 focus:bg-white px-4 py-2 rounded-xl font-bold text-sm outline-none cursor-pointer transition-all'
           >
@@ -164,7 +217,6 @@ export default function Home() {
             checked={showOnlyInStock}
             onChange={(e) => {
               setShowOnlyInStock(e.target.checked);
-              setCurrentPage(1);
             }}
           />
           <label
@@ -182,11 +234,10 @@ export default function Home() {
           <div className='relative w-full'>
             <input
               type='text'
-              placeholder='Search by title or author...'
+              placeholder='Search title, author, series, ISBN...'
               value={searchTerm}
               onChange={(e) => {
                 setSearchTerm(e.target.value);
-                setCurrentPage(1);
               }}
               className='w-full bg-slate-50 border-2 border-transparent focus:border-indigo-600 focus:bg-white px-5 py-2.5 rounded-xl font-bold text-sm outline-none transition-all pr-12'
             />
@@ -240,7 +291,7 @@ export default function Home() {
               {/* LARGE HIGH-CONTRAST BUTTONS */}
               <div className='flex gap-2'>
                 <button
-                  onClick={() => setSelectedBook(book)}
+                  onClick={() => openBook(book)}
                   className='flex-1 text-xs font-black uppercase tracking-widest bg-slate-900 text-white px-4 py-4 rounded-xl hover:bg-indigo-600 transition-colors shadow-lg'
                 >
                   View and Borrow
@@ -251,6 +302,18 @@ export default function Home() {
         ))}
       </div>
 
+      {nextCursor && (
+        <div className='flex justify-center mt-10'>
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className='px-10 py-4 bg-slate-900 text-white rounded-2xl text-xs font-black uppercase tracking-widest hover:bg-indigo-600 transition-colors shadow-lg disabled:opacity-50'
+          >
+            {loadingMore ? "Loading..." : "Load More"}
+          </button>
+        </div>
+      )}
+
       {/* MODAL (Restored all fields) */}
 
       {selectedBook && (